@@ -1,106 +1,633 @@
 import os
 import sys
+import csv
+import json
+import time
+import queue
 import random
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+import threading
+import argparse
+from contextlib import contextmanager, redirect_stdout
+from types import MappingProxyType
 from datetime import datetime
-from openpyxl.cell.cell import MergedCell
 import itertools
 
+# openpyxl takes longer to import than everything else put together, so it
+# is only imported where a workbook is actually read or written, as are the
+# profiling and hashing modules, to keep scripted calls quick to start
 
+def get_application_path():
+    # Where the roster and the player database live: next to the script, or
+    # next to the executable of a PyInstaller bundle (sys._MEIPASS is a
+    # temporary folder that is deleted when the program exits)
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    else:
+        return os.path.dirname(os.path.abspath(__file__))
 
+# Player fields shown in the report sheets
+REPORT_FIELDS = ('id', 'name', 'score', 'opponent_scores', 'wins', 'black_wins', 'byes',
+                 'median_buchholz', 'sonneborn_berger', 'progressive')
+
+class Player:
+    # One roster entry. Color history is kept as running counters rather than
+    # a list, so memory and the cost of every sort key stay flat as rounds go
+    # by. Reporting code can keep using player['score'] style access.
+    __slots__ = ('id', 'name', 'key', 'score', 'opponent_scores', 'wins', 'black_wins',
+                 'whites', 'blacks', 'byes', 'last_color', 'head_to_head', 'games',
+                 'median_buchholz', 'sonneborn_berger', 'progressive', 'rating', 'virtual_points')
+
+    def __init__(self, id, name, key=''):
+        self.id = id
+        self.name = name
+        self.key = key  # Tells apart players who share a name; see distinct_keys
+        self.score = 0
+        self.opponent_scores = 0  # Buchholz, recomputed after every round
+        self.wins = 0
+        self.black_wins = 0
+        self.whites = 0
+        self.blacks = 0
+        self.byes = 0
+        self.last_color = None  # 'W' or 'B' from the last game actually played
+        self.head_to_head = {}
+        self.games = []  # (opponent id or None for a bye, points scored) per round
+        self.median_buchholz = 0
+        self.sonneborn_berger = 0
+        self.progressive = 0
+        self.rating = None  # Stored rating from the player database, used for round 1 seeding
+        self.virtual_points = 0  # Accelerated pairings only; counted for pairing, never for the standings
+
+    def add_color(self, color):
+        if color == 'W':
+            self.whites += 1
+            self.last_color = 'W'
+        elif color == 'B':
+            self.blacks += 1
+            self.last_color = 'B'
+        else:
+            self.byes += 1
 
-def get_application_path():
-    return r'C:\CF'
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __repr__(self):
+        return f"Player({self.id!r}, {self.name!r})"
+
+    def snapshot(self):
+        # Read-only copy of the fields the reports show, safe to hand to the
+        # background report writer while the tournament moves on
+        return MappingProxyType({field: getattr(self, field) for field in REPORT_FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        player = cls(data['id'], data['name'], data.get('key', ''))
+        for field in cls.__slots__:
+            if field in data:  # Snapshots from older versions lack newer fields
+                setattr(player, field, data[field])
+        player.games = [tuple(game) for game in player.games]
+        return player
+
+ROSTER_FILES = ["players.xlsx", "players.csv", "players.jsonl"]
+
+def find_roster_file(app_path):
+    for name in ROSTER_FILES:
+        path = os.path.join(app_path, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(os.path.join(app_path, ROSTER_FILES[0]))
+
+def distinct_keys(entries):
+    # Roster entries as [name, key], where the key is the roster's own id for
+    # the player, or '' when it has none. Entries that would still be the
+    # same get "#2", "#3", ... appended to the key, so that the player
+    # database never takes two people for one.
+    counts = {}
+    distinct = []
+    for name, key in entries:
+        counts[name, key] = counts.get((name, key), 0) + 1
+        distinct.append([name, key if counts[name, key] == 1 else f"{key}#{counts[name, key]}"])
+    return distinct
+
+def roster_key(value):
+    return str(value).strip() if value is not None else ''
+
+def read_roster(roster_file):
+    # The roster's entries as [name, key], in file order
+    extension = os.path.splitext(roster_file)[1].lower()
+    entries = []
+    if extension == '.csv':
+        with open(roster_file, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader, [])]
+            # Same layout as players.xlsx (ids in column A, names in column B)
+            # unless the columns are called "name" and "id" or "player id"
+            if 'name' in header:
+                column = header.index('name')
+                key_column = next((header.index(title) for title in ('player id', 'id') if title in header), None)
+            else:
+                column = min(1, len(header) - 1)
+                key_column = 0 if column == 1 else None
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    key = row[key_column] if key_column is not None and len(row) > key_column else None
+                    entries.append([row[column].strip(), roster_key(key)])
+    elif extension == '.jsonl':
+        with open(roster_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                name = entry.get('name') if isinstance(entry, dict) else entry
+                if name:
+                    entries.append([str(name), roster_key(entry.get('id') if isinstance(entry, dict) else None)])
+    else:
+        # Read-only mode streams rows instead of building the whole sheet
+        from openpyxl import load_workbook
+        wb = load_workbook(roster_file, read_only=True)
+        try:
+            for row in wb.active.iter_rows(min_row=2, min_col=1, max_col=2, values_only=True):
+                if len(row) > 1 and row[1]:
+                    entries.append([row[1], roster_key(row[0])])
+        finally:
+            wb.close()
+    return distinct_keys(entries)
+
+def file_digest(path):
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_roster(roster_file):
+    # Parsed rosters are cached in a JSON snapshot next to the source file.
+    # An unchanged mtime reuses it straight away; a changed mtime falls back
+    # to comparing content hashes before parsing the roster again.
+    snapshot_file = roster_file + ".snapshot.json"
+    mtime = os.path.getmtime(roster_file)
+    snapshot = None
+    try:
+        with open(snapshot_file, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    # Snapshots from older versions hold bare names and are parsed again
+    if snapshot is not None and 'entries' in snapshot and snapshot.get('mtime') == mtime:
+        return snapshot['entries']
+
+    digest = file_digest(roster_file)
+    if snapshot is not None and 'entries' in snapshot and snapshot.get('sha256') == digest:
+        entries = snapshot['entries']
+    else:
+        entries = read_roster(roster_file)
+
+    try:
+        with open(snapshot_file, 'w', encoding='utf-8') as f:
+            json.dump({'mtime': mtime, 'sha256': digest, 'entries': entries}, f, ensure_ascii=False)
+    except OSError:
+        pass  # A read-only roster folder just means no cache
+    return entries
 
 def get_players_from_excel(num_players):
     app_path = get_application_path()
-    excel_file = os.path.join(app_path, "players.xlsx")
+    excel_file = os.path.join(app_path, ROSTER_FILES[0])
     
     try:
-        wb = load_workbook(excel_file)
-        ws = wb.active
-        players = []
-        for row in ws.iter_rows(min_row=2, min_col=2, max_col=2, values_only=True):
-            if row[0] and len(players) < num_players:
-                players.append({
-                    "name": row[0],
-                    "score": 0,
-                    "colors": [],
-                    "opponent_scores": 0,
-                    "wins": 0,
-                    "black_wins": 0,
-                    "head_to_head": {}
-                })
-            if len(players) == num_players:
-                break
+        excel_file = find_roster_file(app_path)
+        entries = load_roster(excel_file)
+        players = [Player(i, name, key) for i, (name, key) in enumerate(entries[:num_players])]
         
         if len(players) < num_players:
-            print(f"Warning: Only found {len(players)} players in the Excel file.")
+            print(f"Warning: Only found {len(players)} players in {os.path.basename(excel_file)}.")
         
         return players
     except FileNotFoundError:
-        print(f"Error: 'players.xlsx' file not found in the directory: {app_path}")
+        print(f"Error: no roster file ({', '.join(ROSTER_FILES)}) found in the directory: {app_path}")
         print("Please ensure that the 'players.xlsx' file is in the same directory as the script or executable.")
         input("Press Enter to exit...")
         sys.exit(1)
     except Exception as e:
-        print(f"An error occurred while reading the Excel file: {str(e)}")
+        print(f"An error occurred while reading the roster file: {str(e)}")
         print(f"Full path of the file being accessed: {excel_file}")
         input("Press Enter to exit...")
         sys.exit(1)
 
 
-def create_matches(players, played_matches, round_number):
+class PlayedMatches:
+    # Who has met whom, as one bitset of opponent ids per player. Ids are
+    # assigned once at roster load, so both questions below are a couple of
+    # integer operations regardless of the field size.
+    def __init__(self, num_players):
+        self.opponents = [0] * num_players
+        self.everyone = (1 << num_players) - 1
+
+    def add(self, player, opponent):
+        self.opponents[player['id']] |= 1 << opponent['id']
+        self.opponents[opponent['id']] |= 1 << player['id']
+
+    def have_met(self, player, opponent):
+        return bool(self.opponents[player['id']] >> opponent['id'] & 1)
+
+    def remaining_opponents(self, player):
+        legal = self.everyone & ~self.opponents[player['id']] & ~(1 << player['id'])
+        return bin(legal).count('1')
+
+
+# Pairing costs. Score-group distance dominates, then colors, then byes.
+SCORE_DISTANCE_COST = 1000
+COLOR_IMBALANCE_COST = 50
+COLOR_REPEAT_COST = 5
+BYE_REPEAT_COST = 100000
+BYE_SCORE_COST = 10
+
+MAX_PLAYERS = 2000
+
+# Partners are searched within this many places of each other in the
+# standings order. Where no pairing fits, the window is widened for the
+# players around that place only, up to MAX_PAIRING_WINDOW; past that, the
+# players there are paired with the blossom algorithm (see blossom.py).
+PAIRING_WINDOW = 6
+MAX_PAIRING_WINDOW = 12
+
+# The window can miss a cheaper pairing that needs partners further apart,
+# and that shows as a repeat bye or a round costing as much as one. Such a
+# round is solved again with the blossom algorithm over the whole field. Up
+# to this many players that is quick enough to do for either sign; above it,
+# where a round's floats routinely add up to that much, only for a repeat
+# bye, so that nobody has a second bye while someone else has none to give.
+EXACT_PAIRING_MAX_PLAYERS = 128
+
+# Fields up to this size check each round's pairing against the rounds still
+# to come (see lookahead.py), since small fields are the ones that run out of
+# legal opponents before the last round
+LOOKAHEAD_MAX_PLAYERS = 32
+
+# Fields from this size are offered accelerated pairings, where the early
+# rounds would otherwise be mostly mismatches between the two halves
+ACCELERATED_MIN_PLAYERS = 40
+
+
+def assign_colors(player, opponent):
+    # Whoever is behind on whites gets white; if level, alternate from last game
+    player_balance = player.whites - player.blacks
+    opponent_balance = opponent.whites - opponent.blacks
+    if player_balance < opponent_balance:
+        return player, opponent
+    if player_balance > opponent_balance:
+        return opponent, player
+    if player.last_color == 'W':
+        return opponent, player
+    return player, opponent
+
+
+def pairing_score(player):
+    # The score players are paired on: the real one plus any virtual points
+    return player.score + player.virtual_points
+
+
+def pairing_cost(player, opponent):
+    cost = SCORE_DISTANCE_COST * (pairing_score(player) - pairing_score(opponent)) ** 2
+
+    white, black = assign_colors(player, opponent)
+    white_balance = white.whites - white.blacks
+    black_balance = black.whites - black.blacks
+    if white_balance > 0:
+        cost += COLOR_IMBALANCE_COST * white_balance
+    elif white.last_color == 'W':
+        cost += COLOR_REPEAT_COST
+    if black_balance < 0:
+        cost += COLOR_IMBALANCE_COST * -black_balance
+    elif black.last_color == 'B':
+        cost += COLOR_REPEAT_COST
+    return cost
+
+
+def bye_cost(player):
+    return BYE_REPEAT_COST * player.byes + BYE_SCORE_COST * pairing_score(player)
+
+
+def total_cost(pairs, bye):
+    return sum(pairing_cost(a, b) for a, b in pairs) + (bye_cost(bye) if bye is not None else 0)
+
+
+def solve_pairings(players, can_pair, windows, need_bye, layers, edge_costs):
+    # Minimum-cost perfect matching over the standings order, restricted to
+    # partners less than windows[i] places after player i. Each state is a
+    # bitmask of the upcoming places already taken by an earlier player, plus
+    # a low bit for whether the bye has been handed out; the cheapest path
+    # through the states is the optimal pairing for the whole round.
+    # layers holds the states of the places already done and is extended in
+    # place, so the search can resume after widening some windows. Returns
+    # the pairing and None, or None and the place where every state died.
+    n = len(players)
+
+    def edge_cost(i, j):
+        # None marks a forbidden pairing; each edge is looked at once per call
+        key = i * n + j
+        if key not in edge_costs:
+            if can_pair(players[i], players[j]):
+                edge_costs[key] = pairing_cost(players[i], players[j])
+            else:
+                edge_costs[key] = None
+        return edge_costs[key]
+
+    for i in range(len(layers) - 1, n):
+        current = layers[i]
+        following = {}
+
+        def relax(state, cost, previous, action):
+            best = following.get(state)
+            if best is None or cost < best[0]:
+                following[state] = (cost, previous, action)
+
+        for state, (cost, _, _) in current.items():
+            bye_given = state & 1
+            taken = state >> 1
+            if taken & 1:
+                relax(((taken >> 1) << 1) | bye_given, cost, state, None)
+                continue
+            for k in range(1, min(windows[i], n - i)):
+                if taken >> k & 1:
+                    continue
+                pair_cost = edge_cost(i, i + k)
+                if pair_cost is None:
+                    continue
+                relax((((taken | (1 << k)) >> 1) << 1) | bye_given,
+                      cost + pair_cost, state, i + k)
+            if need_bye and not bye_given:
+                relax(((taken >> 1) << 1) | 1, cost + bye_cost(players[i]), state, -1)
+
+        if not following:
+            return None, i
+        layers.append(following)
+
+    final_state = 1 if need_bye else 0
+    if final_state not in layers[n]:
+        return None, n - 1
+
+    pairs = []
+    bye = None
+    state = final_state
+    for i in range(n, 0, -1):
+        _, previous, action = layers[i][state]
+        if action == -1:
+            bye = players[i - 1]
+        elif action is not None:
+            pairs.append((players[i - 1], players[action]))
+        state = previous
+    pairs.reverse()
+    return (pairs, bye), None
+
+
+def seed_players(players):
+    # Strongest first, with unrated players after the rated ones in random
+    # order. The halves are then interleaved so that the pairing, which joins
+    # neighbours when nothing else differs, meets top half against bottom
+    # half, and the odd player out at the very bottom gets the bye.
+    random.shuffle(players)
+    players.sort(key=lambda player: (player.rating is None, -(player.rating or 0)))
+    half = len(players) // 2
+    top, bottom = players[:half], players[half:]
+    players[:] = [player for pair in zip(top, bottom) for player in pair] + bottom[half:]
+
+def acceleration_group(players):
+    # Group A of accelerated pairings: the rated top half of the field,
+    # rounded up to an even size so that it can be paired within itself.
+    # Unrated players always start in group B.
+    rated = sorted((player for player in players if player.rating is not None), key=lambda player: -player.rating)
+    size = min(2 * ((len(players) + 3) // 4), len(rated) - len(rated) % 2)
+    return sorted(player.id for player in rated[:size])
+
+def virtual_points(round_number, num_rounds):
+    # Baku acceleration: the first half of the rounds (rounded up) are
+    # accelerated. Group A is given a win's worth of points in the first half
+    # of those and a draw's worth in the rest, then nothing.
+    accelerated_rounds = (num_rounds + 1) // 2
+    if round_number <= (accelerated_rounds + 1) // 2:
+        return 2
+    if round_number <= accelerated_rounds:
+        return 1
+    return 0
+
+def accelerate(players, group, round_number, num_rounds):
+    # Hands out the round's virtual points to group A, or clears them when
+    # the event isn't accelerated or the accelerated rounds are over
+    points = virtual_points(round_number, num_rounds) if group else 0
+    group = set(group or ())
+    for player in players:
+        player.virtual_points = points if player.id in group else 0
+
+def order_players(players, round_number):
     if round_number == 1:
-        # First round: random pairings
-        random.shuffle(players)
+        # First round: seeded by rating when there are ratings, random
+        # otherwise. Accelerated groups are seeded each on their own, so
+        # group A plays within itself.
+        if any(player.rating is not None for player in players):
+            groups = {}
+            for player in players:
+                groups.setdefault(player.virtual_points, []).append(player)
+            players.clear()
+            for points in sorted(groups, reverse=True):
+                seed_players(groups[points])
+                players.extend(groups[points])
+        else:
+            random.shuffle(players)
     else:
-        # Sort players by score, then by opponent's score (for tiebreaks)
-        players.sort(key=lambda x: (-x['score'], -x['opponent_scores']))
-
+        # Sort players by score, virtual points included, then by opponent's
+        # score (for tiebreaks)
+        players.sort(key=lambda x: (-pairing_score(x), -x.opponent_scores))
+
+def find_pairing(players, can_pair):
+    # The cheapest legal pairing of players in their current order, as
+    # (pairs, bye), or None when there is none. The windowed search is
+    # checked against the exact one where it looks to have missed something.
+    solution = window_pairing(players, can_pair)
+    if solution is None:
+        return None
+    repeat_bye = solution[1] is not None and solution[1].byes > 0
+    if repeat_bye or (len(players) <= EXACT_PAIRING_MAX_PLAYERS and total_cost(*solution) >= BYE_REPEAT_COST):
+        from blossom import min_cost_pairing
+        exact = min_cost_pairing(players, can_pair, solution[1] is not None)
+        if exact is not None and total_cost(*exact) < total_cost(*solution):
+            return exact
+    return solution
+
+def window_pairing(players, can_pair):
+    # The cheapest legal pairing with partners close in the standings order,
+    # or None when there is none
+    n = len(players)
+    need_bye = n % 2 == 1
+    windows = n * [min(PAIRING_WINDOW, n)]
+    layers = [{0: (0, None, None)}]
+    edge_costs = {}
+    while True:
+        solution, stuck = solve_pairings(players, can_pair, windows, need_bye, layers, edge_costs)
+        if solution is not None:
+            return solution
+        # Only the players just before the place where the search died get a
+        # wider window, so that a leading group that has all met doesn't make
+        # the search expensive for the whole field
+        first = None
+        for i in range(max(0, stuck - MAX_PAIRING_WINDOW + 1), stuck + 1):
+            wider = min(windows[i] * 2, MAX_PAIRING_WINDOW, n)
+            if wider > windows[i]:
+                windows[i] = wider
+                first = i if first is None else first
+        if first is None:
+            return split_pairing(players, can_pair, need_bye, stuck)
+        del layers[first + 1:]  # The states before the first wider window still hold
+
+def split_pairing(players, can_pair, need_bye, stuck):
+    # The players around the place where the windowed search got stuck are
+    # paired with the blossom algorithm, which has no window, and those before
+    # and after them on their own. The middle part doubles until all three
+    # can be paired, so at worst the whole field goes to the blossom, which
+    # is exact and takes polynomial time.
+    from blossom import min_cost_pairing
+    n = len(players)
+    span = 2 * MAX_PAIRING_WINDOW
+    while True:
+        start = max(0, stuck - span)
+        start -= start % 2  # The players before it need no bye
+        end = min(n, stuck + span)
+        if (end - start) % 2 == 1 and end < n:
+            end += 1  # The players after it take the bye, if there is one
+        parts = [window_pairing(players[:start], can_pair),
+                 min_cost_pairing(players[start:end], can_pair, need_bye and end == n),
+                 window_pairing(players[end:], can_pair)]
+        if all(part is not None for part in parts):
+            pairs = [pair for part_pairs, _ in parts for pair in part_pairs]
+            bye = next((part_bye for _, part_bye in parts if part_bye is not None), None)
+            return pairs, bye
+        if start == 0 and end == n:
+            return None
+        span *= 2
+
+def make_matches(pairs, bye):
+    # Hands out colors and returns the round's boards, bye last
     matches = []
-    paired = set()
-
-    for i, player in enumerate(players):
-        if player['name'] in paired:
-            continue
-
-        for j in range(i + 1, len(players)):
-            opponent = players[j]
-            if opponent['name'] in paired:
-                continue
-            
-            if (player['name'], opponent['name']) not in played_matches and \
-               (opponent['name'], player['name']) not in played_matches:
-                # Determine colors
-                if player['colors'].count('W') < opponent['colors'].count('W'):
-                    white, black = player, opponent
-                elif player['colors'].count('W') > opponent['colors'].count('W'):
-                    white, black = opponent, player
-                else:
-                    # If equal, alternate from last game
-                    if player['colors'] and player['colors'][-1] == 'W':
-                        white, black = opponent, player
-                    else:
-                        white, black = player, opponent
-
-                white['colors'].append('W')
-                black['colors'].append('B')
-                matches.append((white, black))
-                paired.add(white['name'])
-                paired.add(black['name'])
-                break
+    for player, opponent in pairs:
+        white, black = assign_colors(player, opponent)
+        white.add_color('W')
+        black.add_color('B')
+        matches.append((white, black))
 
     # Handle odd number of players
-    if len(paired) < len(players):
-        unpaired = next(p for p in players if p['name'] not in paired)
-        unpaired['colors'].append('X')
-        matches.append((unpaired, None))
+    if bye is not None:
+        bye.add_color('X')
+        matches.append((bye, None))
+
+    return matches
 
+def create_matches(players, played_matches, round_number):
+    order_players(players, round_number)
+
+    def can_pair(player, opponent):
+        # Rematches are never allowed
+        return not played_matches.have_met(player, opponent)
+
+    # Players who have met everyone else can only sit out; more of them than
+    # there are byes to hand out means no legal round exists at all
+    need_bye = len(players) % 2 == 1
+    stranded = sum(1 for player in players if played_matches.remaining_opponents(player) == 0)
+    if stranded > (1 if need_bye else 0):
+        return []
+
+    solution = find_pairing(players, can_pair)
+    if solution is None:
+        return []
+    return make_matches(*solution)
+
+# Fields this small are offered a full round robin instead of Swiss pairings
+ROUND_ROBIN_MAX_PLAYERS = 8
+
+_berger_tables = {}
+
+def round_robin_rounds(num_players):
+    return num_players - 1 + num_players % 2
+
+def berger_schedule(num_players):
+    # Every round of a full round robin from the Berger tables, as
+    # (white, black) seat numbers counted from 1. An odd field gets one extra
+    # seat, and whoever meets it has the bye (black is None). Seats i and j
+    # below the last one meet in round r when i + j - r - 1 is a multiple of
+    # seats - 1; the lower seat has white when i + j is odd. The last seat
+    # plays the one left over and has white in the even rounds, which keeps
+    # everyone within one white of even.
+    if num_players not in _berger_tables:
+        seats = num_players + num_players % 2
+        schedule = []
+        for r in range(1, seats):
+            boards = []
+            last_opponent = next(i for i in range(1, seats) if (2 * i - r - 1) % (seats - 1) == 0)
+            if seats > num_players:
+                boards.append((last_opponent, None))
+            elif r % 2 == 0:
+                boards.append((seats, last_opponent))
+            else:
+                boards.append((last_opponent, seats))
+            for i in range(1, seats):
+                for j in range(i + 1, seats):
+                    if (i + j - r - 1) % (seats - 1) == 0:
+                        boards.append((i, j) if (i + j) % 2 == 1 else (j, i))
+            # Byes go last, as in create_matches
+            boards.sort(key=lambda board: board[1] is None)
+            schedule.append(boards)
+        _berger_tables[num_players] = schedule
+    return _berger_tables[num_players]
+
+def draw_seats(players):
+    # Seat numbers for the round robin, drawn by lot before round 1
+    seats = [player.id for player in players]
+    random.shuffle(seats)
+    return seats
+
+def round_robin_matches(players, seats, round_number):
+    # The round's boards straight from the Berger table for the drawn seats
+    schedule = berger_schedule(len(seats))
+    if not 1 <= round_number <= len(schedule):
+        return []
+
+    players_by_id = {player.id: player for player in players}
+    matches = []
+    for white_seat, black_seat in schedule[round_number - 1]:
+        white = players_by_id[seats[white_seat - 1]]
+        if black_seat is None:
+            white.add_color('X')
+            matches.append((white, None))
+        else:
+            black = players_by_id[seats[black_seat - 1]]
+            white.add_color('W')
+            black.add_color('B')
+            matches.append((white, black))
     return matches
 
+def pair_round(state, round_number, lookahead_workers=None):
+    # Round-robin events follow their schedule; everything else is Swiss,
+    # with a lookahead for small fields until the last round
+    if state.get('seats') is not None:
+        return round_robin_matches(state['players'], state['seats'], round_number)
+    accelerate(state['players'], state.get('accelerated'), round_number, state['num_rounds'])
+    if len(state['players']) <= LOOKAHEAD_MAX_PLAYERS and round_number < state['num_rounds']:
+        from lookahead import lookahead_matches
+        return lookahead_matches(state['players'], state['played_matches'], round_number, state['num_rounds'],
+                                 workers=lookahead_workers)
+    return create_matches(state['players'], state['played_matches'], round_number)
+
 def recommend_rounds(num_players):
     max_rounds = min(int(num_players * 0.4), 12)  # Cap at 12 instead of 10
     if num_players <= 8:
@@ -132,171 +659,288 @@ def play_match(matches):
                 else:
                     print("Invalid input. Please enter '1', '2', 'd', or 'Q'.")
             
-            if winner == '1':
-                results.append((match[0], 2, match[1], 0))
-            elif winner == '2':
-                results.append((match[1], 2, match[0], 0))
-            else:
-                results.append((match[0], 1, match[1], 1))
+            results.append(match_result(match, winner))
     return results
 
-def write_to_excel(players, matches, results, round_number):
-    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
+def match_result(match, winner):
+    # winner is '1' (white), '2' (black) or 'd' (draw), as typed in play_match
+    if winner == '1':
+        return (match[0], 2, match[1], 0)
+    elif winner == '2':
+        return (match[1], 2, match[0], 0)
+    else:
+        return (match[0], 1, match[1], 1)
+
+# Result spellings accepted in results files, mapped to play_match's codes
+RESULT_CODES = {
+    '1': '1', '1-0': '1', 'w': '1',
+    '2': '2', '0-1': '2', 'b': '2',
+    'd': 'd', '=': 'd', '1/2-1/2': 'd', '0.5-0.5': 'd', '½-½': 'd',
+}
+
+def read_result_rows(source):
+    # Rows of a results file as dicts with lower-case keys. '-' reads from
+    # stdin up to the first blank line, so results can be pasted as a block.
+    if source == '-':
+        lines = []
+        for line in sys.stdin:
+            if not line.strip():
+                break
+            lines.append(line)
+        is_jsonl = bool(lines) and lines[0].lstrip().startswith('{')
+    else:
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            lines = f.readlines()
+        is_jsonl = source.lower().endswith('.jsonl')
+
+    if is_jsonl:
+        rows = []
+        for line in lines:
+            if line.strip():
+                rows.append({str(key).lower(): value for key, value in json.loads(line).items()})
+        return rows
+    return [{key.strip().lower(): value for key, value in row.items() if key is not None}
+            for row in csv.DictReader(lines)]
+
+def parse_result_row(matches, row):
+    # Checks one submitted board against the round's pairings. Returns the
+    # table, the play_match winner code and a list of problems; table and
+    # winner are None when the row can't be used.
+    try:
+        table = int(str(row.get('table', '')).strip())
+    except ValueError:
+        return None, None, [f"missing or invalid table number {row.get('table')!r}"]
+    if not 1 <= table <= len(matches):
+        return None, None, [f"there is no table {table} this round"]
+    match = matches[table - 1]
+    if match[1] is None:
+        return None, None, [f"table {table} is {match[0]['name']}'s bye and takes no result"]
+
+    errors = []
+    for column, player in (('white', match[0]), ('black', match[1])):
+        name = row.get(column)
+        if name not in (None, '') and str(name).strip() != str(player['name']):
+            errors.append(f"table {table} {column} is {player['name']}, not {name}")
+    winner = RESULT_CODES.get(str(row.get('result', '')).strip().lower())
+    if winner is None:
+        errors.append(f"invalid result {row.get('result')!r} for table {table}")
+    if errors:
+        return table, None, errors
+    return table, winner, []
+
+def round_results(matches, winners):
+    # Result tuples for a round, given a winner code for every played table
+    results = []
+    for table, match in enumerate(matches, start=1):
+        if match[1] is None:
+            results.append((match[0], 2, None, 0))
+        else:
+            results.append(match_result(match, winners[table]))
+    return results
 
-    
-    # Create 'C:\CF' directory if it doesn't exist
-    report_folder = r'C:\CF'
+def load_round_results(matches, source):
+    # Reads a whole round from a CSV/JSONL file with table, result and
+    # optionally white/black columns. Every board is checked against the
+    # pairings and all problems are reported together; results are only
+    # returned when the whole round is valid, so nothing is applied halfway.
+    try:
+        rows = read_result_rows(source)
+    except (OSError, ValueError, AttributeError) as e:
+        return None, [f"Could not read {source}: {e}"]
+
+    errors = []
+    winners = {}
+    for line, row in enumerate(rows, start=1):
+        table, winner, row_errors = parse_result_row(matches, row)
+        errors.extend(f"Row {line}: {error}" for error in row_errors)
+        if winner is None:
+            continue
+        if table in winners:
+            errors.append(f"Row {line}: table {table} already has a result")
+        else:
+            winners[table] = winner
+
+    missing = [str(table) for table, match in enumerate(matches, start=1)
+               if match[1] is not None and table not in winners]
+    if missing:
+        errors.append(f"No result for table(s) {', '.join(missing)}")
+    if errors:
+        return None, errors
+
+    return round_results(matches, winners), []
+
+def enter_results(matches, round_number):
+    while True:
+        source = input("Press Enter to type in the results for this round, give a results file "
+                       "(CSV/JSONL, '-' to paste them), or 'serve [host:port]' to collect them over HTTP: ").strip()
+        if not source:
+            return play_match(matches)
+        if source.split()[0].lower() == 'serve':
+            from result_server import serve_round, DEFAULT_HOST, DEFAULT_PORT
+            address = source.split()[1] if len(source.split()) > 1 else f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+            host, _, port = address.rpartition(':')
+            try:
+                return serve_round(matches, round_number, host or DEFAULT_HOST, int(port))
+            except (OSError, ValueError) as e:
+                print(f"Could not start the results service on {address}: {e}")
+                continue
+        results, errors = load_round_results(matches, source)
+        if results is not None:
+            print(f"Results for all {len(matches)} tables were read from {source}.")
+            return results
+        print(f"{len(errors)} problem(s) found, no results from {source} were applied:")
+        for error in errors:
+            print(f"  {error}")
+
+REPORT_FOLDER = r'C:\CF'
+
+PLAYER_PALETTE = [
+    'FFC7CE', 'FFEB9C', 'C6EFCE', 'B4C6E7', 'D9D9D9', 'FFA07A', '98FB98', 'ADD8E6',
+    'F08080', 'DDA0DD', 'FFE4B5', '20B2AA', 'F0E68C', 'DEB887', '87CEFA', 'D8BFD8',
+    'FFDAB9', '7FFFD4', 'F0FFF0', 'FFE4E1', 'E6E6FA', 'FFF0F5', 'F5DEB3', 'FAEBD7',
+    'E0FFFF', 'FFB6C1', 'FAFAD2', 'D3D3D3', 'FDF5E6', 'FFEFD5', 'FF69B4', '00FA9A',
+    'FF6347', '4682B4', 'FF4500', '9ACD32', 'FF1493', '00CED1', 'FF00FF', '32CD32',
+    'FA8072', '4169E1', 'F4A460', '2E8B57', 'F08080', '5F9EA0', 'EE82EE', '6B8E23',
+    'FFA500', '483D8B', 'FF7F50', '008080', 'FF6347', '4682B4', 'FF4500', '9ACD32',
+    'FF1493', '00CED1', 'FF00FF', '32CD32', 'FA8072', '4169E1'
+]
+
+class ReportStyles:
+    # Every style the report sheets use, registered with the workbook once per
+    # tournament as named styles. Cells refer to them by name, so writing a
+    # sheet never builds fonts or fills. Each player's color follows their id,
+    # so it stays the same for the whole event.
+    def __init__(self, wb):
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+        thin = Side(style='thin')
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        header_font = Font(bold=True)
+        header_alignment = Alignment(horizontal='center')
+
+        named_styles = [
+            NamedStyle(name='header', font=header_font, alignment=header_alignment),
+            NamedStyle(name='header_bordered', font=header_font, alignment=header_alignment, border=border),
+            NamedStyle(name='title', font=Font(size=16, bold=True), border=border,
+                       alignment=Alignment(horizontal='center', vertical='center')),
+            NamedStyle(name='bordered', border=border),
+        ]
+        for i, color in enumerate(PLAYER_PALETTE):
+            fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
+            named_styles.append(NamedStyle(name=f'player_{i}', fill=fill))
+            named_styles.append(NamedStyle(name=f'player_{i}_bordered', fill=fill, border=border))
+
+        for style in named_styles:
+            # A workbook reopened after a restart already has them
+            if style.name not in wb.named_styles:
+                wb.add_named_style(style)
+
+    def player(self, player, bordered=False):
+        style = f"player_{player['id'] % len(PLAYER_PALETTE)}"
+        return style + '_bordered' if bordered else style
+
+class SheetWriter:
+    # Writes cells and remembers the longest text in each column as it goes,
+    # so column widths are known without rescanning the finished sheet
+    def __init__(self, ws):
+        self.ws = ws
+        self.widths = {}
+
+    def write(self, row, column, value, style=None):
+        cell = self.ws.cell(row=row, column=column, value=value)
+        if style is not None:
+            cell.style = style
+        if isinstance(value, str) and len(value) > self.widths.get(column, 0):
+            self.widths[column] = len(value)
+        return cell
+
+    def write_headers(self, row, headers, style='header'):
+        for col, header in enumerate(headers, start=1):
+            self.write(row, col, header, style)
+
+    def fit_columns(self):
+        from openpyxl.utils import get_column_letter
+        for column, width in self.widths.items():
+            self.ws.column_dimensions[get_column_letter(column)].width = width + 2
+
+
+def tournament_filename(report_folder=REPORT_FOLDER):
+    # Absolute, since the journal keeps it and later calls may well run from
+    # another directory
+    report_folder = os.path.abspath(report_folder)
     os.makedirs(report_folder, exist_ok=True)
-    
-    filename = os.path.join(report_folder, f"game_{current_time}_round_{round_number}.xlsx")
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(report_folder, f"tournament_{current_time}.xlsx")
 
-    try:
-        wb = load_workbook(filename)
-    except FileNotFoundError:
-        wb = Workbook()
-        wb.remove(wb.active)  # Remove the default sheet
+def create_tournament_workbook(report_folder=REPORT_FOLDER):
+    # One workbook holds the whole event. It stays open in memory and every
+    # round adds its sheets to it, so nothing is ever loaded back from disk
+    from openpyxl import Workbook
+    filename = tournament_filename(report_folder)
+
+    wb = Workbook()
+    wb.remove(wb.active)  # Remove the default sheet
+    return wb, filename
 
-    colors = [
-        'FFC7CE', 'FFEB9C', 'C6EFCE', 'B4C6E7', 'D9D9D9', 'FFA07A', '98FB98', 'ADD8E6',
-        'F08080', 'DDA0DD', 'FFE4B5', '20B2AA', 'F0E68C', 'DEB887', '87CEFA', 'D8BFD8',
-        'FFDAB9', '7FFFD4', 'F0FFF0', 'FFE4E1', 'E6E6FA', 'FFF0F5', 'F5DEB3', 'FAEBD7',
-        'E0FFFF', 'FFB6C1', 'FAFAD2', 'D3D3D3', 'FDF5E6', 'FFEFD5', 'FF69B4', '00FA9A',
-        'FF6347', '4682B4', 'FF4500', '9ACD32', 'FF1493', '00CED1', 'FF00FF', '32CD32',
-        'FA8072', '4169E1', 'F4A460', '2E8B57', 'F08080', '5F9EA0', 'EE82EE', '6B8E23',
-        'FFA500', '483D8B', 'FF7F50', '008080', 'FF6347', '4682B4', 'FF4500', '9ACD32',
-        'FF1493', '00CED1', 'FF00FF', '32CD32', 'FA8072', '4169E1'
-    ]
-    player_colors = {player['name']: PatternFill(start_color=colors[i % len(colors)], end_color=colors[i % len(colors)], fill_type='solid') 
-                     for i, player in enumerate(players)}
-
-    ws_pairings = wb.create_sheet(f"Round {round_number} Pairings")
-    ws_pairings.title = f"Round {round_number} Pairings"
-
-    headers = ["Table", "White", "Black"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws_pairings.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
+def write_to_excel(wb, styles, matches, results, round_number):
+    pairings = SheetWriter(wb.create_sheet(f"Round {round_number} Pairings"))
+    pairings.write_headers(1, ["Table", "White", "Black"])
 
     for table_num, match in enumerate(matches, start=1):
-        ws_pairings.cell(row=table_num+1, column=1, value=table_num)
-        player1_cell = ws_pairings.cell(row=table_num+1, column=2, value=match[0]['name'])
-        player1_cell.fill = player_colors[match[0]['name']]
+        pairings.write(table_num+1, 1, table_num)
+        pairings.write(table_num+1, 2, match[0]['name'], styles.player(match[0]))
         if match[1] is not None:
-            player2_cell = ws_pairings.cell(row=table_num+1, column=3, value=match[1]['name'])
-            player2_cell.fill = player_colors[match[1]['name']]
+            pairings.write(table_num+1, 3, match[1]['name'], styles.player(match[1]))
         else:
-            ws_pairings.cell(row=table_num+1, column=3, value="BYE")
+            pairings.write(table_num+1, 3, "BYE")
 
-    ws_results = wb.create_sheet(f"Round {round_number} Results")
-    ws_results.title = f"Round {round_number} Results"
-
-    headers = ["Table", "White", "Score", "Black", "Score"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws_results.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
+    results_sheet = SheetWriter(wb.create_sheet(f"Round {round_number} Results"))
+    results_sheet.write_headers(1, ["Table", "White", "Score", "Black", "Score"])
 
     for table_num, (match, result) in enumerate(zip(matches, results), start=1):
-        ws_results.cell(row=table_num+1, column=1, value=table_num)
-        player1_cell = ws_results.cell(row=table_num+1, column=2, value=match[0]['name'])
-        player1_cell.fill = player_colors[match[0]['name']]
-        ws_results.cell(row=table_num+1, column=3, value=result[1])
+        results_sheet.write(table_num+1, 1, table_num)
+        results_sheet.write(table_num+1, 2, match[0]['name'], styles.player(match[0]))
+        results_sheet.write(table_num+1, 3, result[1])
         if match[1] is not None:
-            player2_cell = ws_results.cell(row=table_num+1, column=4, value=match[1]['name'])
-            player2_cell.fill = player_colors[match[1]['name']]
-            ws_results.cell(row=table_num+1, column=5, value=result[3])
+            results_sheet.write(table_num+1, 4, match[1]['name'], styles.player(match[1]))
+            results_sheet.write(table_num+1, 5, result[3])
         else:
-            ws_results.cell(row=table_num+1, column=4, value="BYE")
-            ws_results.cell(row=table_num+1, column=5, value="-")
-
-    for ws in [ws_pairings, ws_results]:
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column].width = adjusted_width
-
-    wb.save(filename)
-    return filename
-
-def update_standings(players, filename, round_number):
-    wb = load_workbook(filename)
+            results_sheet.write(table_num+1, 4, "BYE")
+            results_sheet.write(table_num+1, 5, "-")
+
+    pairings.fit_columns()
+    results_sheet.fit_columns()
+
+def update_standings(wb, styles, standings, round_number):
     sheet_name = f"Standings Round {round_number}"
     if sheet_name in wb.sheetnames:
         wb.remove(wb[sheet_name])
-    ws = wb.create_sheet(sheet_name)
-
-    headers = ["Rank", "Player", "Score", "Opponent Scores", "Wins", "Black Wins", "Byes"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    colors = [
-        'FFC7CE', 'FFEB9C', 'C6EFCE', 'B4C6E7', 'D9D9D9', 'FFA07A', '98FB98', 'ADD8E6',
-        'F08080', 'DDA0DD', 'FFE4B5', '20B2AA', 'F0E68C', 'DEB887', '87CEFA', 'D8BFD8',
-        'FFDAB9', '7FFFD4', 'F0FFF0', 'FFE4E1', 'E6E6FA', 'FFF0F5', 'F5DEB3', 'FAEBD7',
-        'E0FFFF', 'FFB6C1', 'FAFAD2', 'D3D3D3', 'FDF5E6', 'FFEFD5', 'FF69B4', '00FA9A',
-        'FF6347', '4682B4', 'FF4500', '9ACD32', 'FF1493', '00CED1', 'FF00FF', '32CD32',
-        'FA8072', '4169E1', 'F4A460', '2E8B57', 'F08080', '5F9EA0', 'EE82EE', '6B8E23',
-        'FFA500', '483D8B', 'FF7F50', '008080', 'FF6347', '4682B4', 'FF4500', '9ACD32',
-        'FF1493', '00CED1', 'FF00FF', '32CD32', 'FA8072', '4169E1'
-    ]
-    player_colors = {player['name']: PatternFill(start_color=colors[i % len(colors)], end_color=colors[i % len(colors)], fill_type='solid') 
-                     for i, player in enumerate(players)}
-
-    def custom_sort(player):
-        return (player['score'], player['opponent_scores'], player['wins'], player['black_wins'], -player['colors'].count('X'))
-
-    sorted_players = sorted(players, key=custom_sort, reverse=True)
-    
-    # Apply head-to-head tiebreaker
-    for i in range(len(sorted_players) - 1):
-        for j in range(i + 1, len(sorted_players)):
-            if custom_sort(sorted_players[i]) == custom_sort(sorted_players[j]):
-                if head_to_head_compare(sorted_players[i], sorted_players[j]) < 0:
-                    sorted_players[i], sorted_players[j] = sorted_players[j], sorted_players[i]
-
-    for rank, player in enumerate(sorted_players, start=1):
-        ws.cell(row=rank+1, column=1, value=rank)
-        player_cell = ws.cell(row=rank+1, column=2, value=player['name'])
-        player_cell.fill = player_colors[player['name']]
-        ws.cell(row=rank+1, column=3, value=player['score'])
-        ws.cell(row=rank+1, column=4, value=f"{player['opponent_scores']:.2f}")
-        ws.cell(row=rank+1, column=5, value=player['wins'])
-        ws.cell(row=rank+1, column=6, value=player['black_wins'])
-        ws.cell(row=rank+1, column=7, value=player['colors'].count('X'))
-
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column].width = adjusted_width
+    sheet = SheetWriter(wb.create_sheet(sheet_name))
+
+    sheet.write_headers(1, ["Rank", "Player", "Score", "Opponent Scores", "Wins", "Black Wins", "Byes",
+                            "Median Buchholz", "Sonneborn-Berger", "Progressive"])
+
+    for rank, player in enumerate(standings, start=1):
+        sheet.write(rank+1, 1, rank)
+        sheet.write(rank+1, 2, player['name'], styles.player(player))
+        sheet.write(rank+1, 3, player['score'])
+        sheet.write(rank+1, 4, f"{player['opponent_scores']:.2f}")
+        sheet.write(rank+1, 5, player['wins'])
+        sheet.write(rank+1, 6, player['black_wins'])
+        sheet.write(rank+1, 7, player['byes'])
+        sheet.write(rank+1, 8, player['median_buchholz'])
+        sheet.write(rank+1, 9, f"{player['sonneborn_berger']:.2f}")
+        sheet.write(rank+1, 10, player['progressive'])
 
-    wb.save(filename)
+    sheet.fit_columns()
 
 def get_number_of_players():
     while True:
         try:
-            num_players = int(input("Enter the number of players (4-60): "))
-            if 4 <= num_players <= 60:
+            num_players = int(input(f"Enter the number of players (4-{MAX_PLAYERS}): "))
+            if 4 <= num_players <= MAX_PLAYERS:
                 return num_players
             else:
-                print("Please enter a number between 4 and 60.")
+                print(f"Please enter a number between 4 and {MAX_PLAYERS}.")
         except ValueError:
             print("Please enter a valid number.")
 
@@ -327,21 +971,11 @@ def display_matches(matches):
             print(f"Table {i}: {match[0]['name']} (White) vs {match[1]['name']} (Black)")
 
 def display_scores(players):
-    def custom_sort(player):
-        return (player['score'], player['opponent_scores'], player['wins'], player['black_wins'], -player['colors'].count('X'))
-
-    sorted_players = sorted(players, key=custom_sort, reverse=True)
-    
-    # Apply head-to-head tiebreaker
-    for i in range(len(sorted_players) - 1):
-        for j in range(i + 1, len(sorted_players)):
-            if custom_sort(sorted_players[i]) == custom_sort(sorted_players[j]):
-                if head_to_head_compare(sorted_players[i], sorted_players[j]) < 0:
-                    sorted_players[i], sorted_players[j] = sorted_players[j], sorted_players[i]
+    sorted_players = get_standings(players)
 
     print("\nCurrent Standings:")
     for i, player in enumerate(sorted_players, 1):
-        print(f"{i}. {player['name']}: {player['score']} points (Opponent scores: {player['opponent_scores']:.2f}, Wins: {player['wins']}, Black wins: {player['black_wins']}, Byes: {player['colors'].count('X')})")
+        print(f"{i}. {player['name']}: {player['score']} points (Opponent scores: {player['opponent_scores']:.2f}, Wins: {player['wins']}, Black wins: {player['black_wins']}, Byes: {player['byes']})")
 
 def update_scores(results, players):
     for result in results:
@@ -350,189 +984,508 @@ def update_scores(results, players):
         if player2 is not None:
             if score1 == 2:  # A win
                 player1['wins'] += 1
-                if player1['colors'][-1] == 'B':  # If the player won with black
+                if player1['last_color'] == 'B':  # If the player won with black
                     player1['black_wins'] += 1
             player2['score'] += score2
             if score2 == 2:  # A win for the second player
                 player2['wins'] += 1
-                if player2['colors'][-1] == 'B':  # If the second player won with black
+                if player2['last_color'] == 'B':  # If the second player won with black
                     player2['black_wins'] += 1
-            player1['opponent_scores'] += player2['score']
-            player2['opponent_scores'] += player1['score']
-            
-            # Record head-to-head result
-            if score1 > score2:
-                player1['head_to_head'][player2['name']] = 'W'
-                player2['head_to_head'][player1['name']] = 'L'
-            elif score1 < score2:
-                player1['head_to_head'][player2['name']] = 'L'
-                player2['head_to_head'][player1['name']] = 'W'
-            else:
-                player1['head_to_head'][player2['name']] = 'D'
-                player2['head_to_head'][player1['name']] = 'D'
+            player1['games'].append((player2['id'], score1))
+            player2['games'].append((player1['id'], score2))
+
+            # Record head-to-head result, by id since names need not be unique
+            player1['head_to_head'][player2['id']] = head_to_head_result(score1, score2)
+            player2['head_to_head'][player1['id']] = head_to_head_result(score2, score1)
         else:
             # For byes, the player gets 2 points (a win) and 0 opponent score
             player1['wins'] += 1
-            # We don't add anything to opponent_scores for a bye
+            player1['games'].append((None, score1))
+
+    compute_tiebreaks(players)
+    _standings_cache.clear()
+
 
-    # Round all opponent scores to two decimal places
+def compute_tiebreaks(players):
+    # Tiebreaks depend on the opponents' current scores, so they are rebuilt
+    # for the whole field from the results table after every round rather
+    # than accumulated when each game is played
+    scores = {player.id: player.score for player in players}
     for player in players:
-        player['opponent_scores'] = round(player['opponent_scores'], 2)
+        opponent_scores = []
+        sonneborn_berger = 0
+        progressive = 0
+        running_score = 0
+        for opponent_id, points in player.games:
+            running_score += points
+            progressive += running_score
+            if opponent_id is None:
+                continue  # Byes add nothing to opponent-based tiebreaks
+            opponent_score = scores[opponent_id]
+            opponent_scores.append(opponent_score)
+            sonneborn_berger += opponent_score * points / 2
+
+        buchholz = sum(opponent_scores)
+        if len(opponent_scores) >= 3:
+            median_buchholz = buchholz - max(opponent_scores) - min(opponent_scores)
+        else:
+            median_buchholz = buchholz
 
+        player.opponent_scores = buchholz
+        player.median_buchholz = median_buchholz
+        player.sonneborn_berger = sonneborn_berger
+        player.progressive = progressive
 
-def head_to_head_compare(player1, player2):
-    if player2['name'] in player1['head_to_head']:
-        result = player1['head_to_head'][player2['name']]
-        if result == 'W':
-            return 1
-        elif result == 'L':
-            return -1
-    return 0  # If they haven't played or drew
 
+HEAD_TO_HEAD_POINTS = {'W': 2, 'D': 1, 'L': 0}
 
+def head_to_head_result(score, opponent_score):
+    if score > opponent_score:
+        return 'W'
+    if score < opponent_score:
+        return 'L'
+    return 'D'
 
+# Standings only change when update_scores runs, so every report in a round
+# shares one ordering
+_standings_cache = {}
 
 
+def standings_key(player):
+    return (player.score, player.opponent_scores, player.wins, player.black_wins, -player.byes)
+
+
+def compute_standings(players):
+    tie_groups = {}
+    for player in players:
+        tie_groups.setdefault(standings_key(player), []).append(player)
+
+    # Players still level on every tiebreak are separated by a mini-table of
+    # their games against each other, which stays consistent for any group size
+    mini_table = {}
+    for group in tie_groups.values():
+        if len(group) < 2:
+            continue
+        ids = {player.id for player in group}
+        for player in group:
+            mini_table[player.id] = sum(HEAD_TO_HEAD_POINTS[result]
+                                        for opponent, result in player.head_to_head.items()
+                                        if opponent in ids)
+
+    return sorted(players, key=lambda player: standings_key(player) + (mini_table.get(player.id, 0),),
+                  reverse=True)
+
+
+def get_standings(players):
+    if _standings_cache.get('players') is not players:
+        _standings_cache['players'] = players
+        _standings_cache['order'] = compute_standings(players)
+    return list(_standings_cache['order'])
 
-def get_application_path():
-    if getattr(sys, 'frozen', False):
-        # If the application is run as a bundle, the PyInstaller bootloader
-        # extends the sys module by a flag frozen=True and sets the app 
-        # path into variable _MEIPASS'.
-        return sys._MEIPASS
-    else:
-        return os.path.dirname(os.path.abspath(__file__))
 
-def generate_summary(players, all_matches, all_results, num_rounds, filename):
-    # Create 'C:\CF' directory if it doesn't exist
-    report_folder = r'C:\CF'
-    os.makedirs(report_folder, exist_ok=True)
 
-    # Generate a new filename in the report folder
-    base_filename = os.path.basename(filename)
-    new_filename = os.path.join(report_folder, f"summary_{base_filename}")
 
-    # Load the workbook and create a new sheet
-    wb = load_workbook(filename)
-    ws = wb.create_sheet("Tournament Summary")
 
-    # Title
-    ws.merge_cells('A1:K1')
-    title_cell = ws['A1']
-    title_cell.value = "Chess Tournament Summary"
-    title_cell.font = Font(size=16, bold=True)
-    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+
+class Crosstable:
+    # Each player's color, opponent and score for every round, indexed by
+    # player id as rounds complete so reports never search a round's boards.
+    # Opponents are kept by id, since names need not be unique, and only
+    # named when a report is written. The boards themselves are kept in
+    # table order for the exporters.
+    def __init__(self):
+        self.rows = {}
+        self.boards = {}
+
+    def add_round(self, round_number, matches, results):
+        self.boards[round_number] = [[white.id, black.id if black else None] for white, black in matches]
+        for white, black in matches:
+            self.rows.setdefault(white.id, {})[round_number] = ['W', black.id if black else None, None]
+            if black is not None:
+                self.rows.setdefault(black.id, {})[round_number] = ['B', white.id, None]
+        for player1, score1, player2, score2 in results:
+            self.rows[player1.id][round_number][2] = score1
+            if player2 is not None:
+                self.rows[player2.id][round_number][2] = score2
+
+    def entry(self, player, round_number):
+        # (color, opponent id or None for a bye, score or None), or None if
+        # not paired
+        return self.rows.get(player['id'], {}).get(round_number)
+
+    def cell(self, player, round_number, names):
+        # The entry as report text, "W vs <opponent> (score)", with names
+        # mapping player ids to names; None if not paired
+        entry = self.entry(player, round_number)
+        if entry is None:
+            return None
+        color, opponent, score = entry
+        text = f"{color} vs {names[opponent] if opponent is not None else 'BYE'}"
+        return f"{text} ({score})" if score is not None else text
+
+
+def generate_summary(wb, styles, standings, crosstable, num_rounds):
+    ws = wb.create_sheet("Tournament Summary")
+    sheet = SheetWriter(ws)
 
     # Headers
     headers = ["Rank", "Player"] + [f"Round {i+1}" for i in range(num_rounds)] + ["Total Score", "Opponent Scores", "Wins", "Black Wins", "Byes"]
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=2, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Sort players
-    def custom_sort(player):
-        return (player['score'], player['opponent_scores'], player['wins'], player['black_wins'], -player['colors'].count('X'))
+    sheet.write_headers(2, headers, 'header_bordered')
 
-    sorted_players = sorted(players, key=custom_sort, reverse=True)
-    
-    # Apply head-to-head tiebreaker
-    for i in range(len(sorted_players) - 1):
-        for j in range(i + 1, len(sorted_players)):
-            if custom_sort(sorted_players[i]) == custom_sort(sorted_players[j]):
-                if head_to_head_compare(sorted_players[i], sorted_players[j]) < 0:
-                    sorted_players[i], sorted_players[j] = sorted_players[j], sorted_players[i]
-
-    # Colors for players
-    colors = [
-        'FFC7CE', 'FFEB9C', 'C6EFCE', 'B4C6E7', 'D9D9D9', 'FFA07A', '98FB98', 'ADD8E6',
-        'F08080', 'DDA0DD', 'FFE4B5', '20B2AA', 'F0E68C', 'DEB887', '87CEFA', 'D8BFD8',
-        'FFDAB9', '7FFFD4', 'F0FFF0', 'FFE4E1', 'E6E6FA', 'FFF0F5', 'F5DEB3', 'FAEBD7',
-        'E0FFFF', 'FFB6C1', 'FAFAD2', 'D3D3D3', 'FDF5E6', 'FFEFD5', 'FF69B4', '00FA9A',
-        'FF6347', '4682B4', 'FF4500', '9ACD32', 'FF1493', '00CED1', 'FF00FF', '32CD32',
-        'FA8072', '4169E1', 'F4A460', '2E8B57', 'F08080', '5F9EA0', 'EE82EE', '6B8E23',
-        'FFA500', '483D8B', 'FF7F50', '008080', 'FF6347', '4682B4', 'FF4500', '9ACD32',
-        'FF1493', '00CED1', 'FF00FF', '32CD32', 'FA8072', '4169E1'
-    ]
-    player_colors = {player['name']: PatternFill(start_color=colors[i % len(colors)], end_color=colors[i % len(colors)], fill_type='solid') 
-                     for i, player in enumerate(players)}
+    # Title, kept out of the width tracking since it spans the whole table
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
+    ws['A1'].value = "Chess Tournament Summary"
+    for row in ws.iter_rows(min_row=1, max_row=1, min_col=1, max_col=len(headers)):
+        for cell in row:
+            cell.style = 'title'
 
     # Player data
-    for rank, player in enumerate(sorted_players, start=1):
+    names = {player['id']: player['name'] for player in standings}
+    for rank, player in enumerate(standings, start=1):
         row = rank + 2
-        ws.cell(row=row, column=1, value=rank)
-        player_cell = ws.cell(row=row, column=2, value=player['name'])
-        player_cell.fill = player_colors[player['name']]
+        sheet.write(row, 1, rank, 'bordered')
+        sheet.write(row, 2, player['name'], styles.player(player, bordered=True))
         
         # Pairing history and results
         for round in range(num_rounds):
-            match = next((m for m in all_matches[round] if player['name'] in [m[0]['name'], m[1]['name'] if m[1] else None]), None)
-            result = next((r for r in all_results[round] if player['name'] in [r[0]['name'], r[2]['name'] if r[2] else None]), None)
-            
-            if match:
-                if match[0]['name'] == player['name']:
-                    opponent = match[1]['name'] if match[1] else "BYE"
-                    color = "W"
-                else:
-                    opponent = match[0]['name']
-                    color = "B"
-                
-                if result:
-                    if result[0]['name'] == player['name']:
-                        score = result[1]
-                    else:
-                        score = result[3]
-                    
-                    cell_value = f"{color} vs {opponent} ({score})"
-                else:
-                    cell_value = f"{color} vs {opponent}"
-                
-                ws.cell(row=row, column=round+3, value=cell_value)
+            sheet.write(row, round+3, crosstable.cell(player, round + 1, names), 'bordered')
         
         # Total score and other statistics
-        ws.cell(row=row, column=num_rounds+3, value=player['score'])
-        ws.cell(row=row, column=num_rounds+4, value=f"{player['opponent_scores']:.2f}")
-        ws.cell(row=row, column=num_rounds+5, value=player['wins'])
-        ws.cell(row=row, column=num_rounds+6, value=player['black_wins'])
-        ws.cell(row=row, column=num_rounds+7, value=player['colors'].count('X'))
+        sheet.write(row, num_rounds+3, player['score'], 'bordered')
+        sheet.write(row, num_rounds+4, f"{player['opponent_scores']:.2f}", 'bordered')
+        sheet.write(row, num_rounds+5, player['wins'], 'bordered')
+        sheet.write(row, num_rounds+6, player['black_wins'], 'bordered')
+        sheet.write(row, num_rounds+7, player['byes'], 'bordered')
 
     # Adjust column widths
+    sheet.fit_columns()
     ws.column_dimensions['A'].width = 5  # Set a fixed width for the "Rank" column
-    for col in range(2, len(headers) + 1):
-        max_length = 0
-        column_letter = get_column_letter(col)
-        for row in range(1, len(players) + 3):  # +3 to include title and header rows
-            cell = ws.cell(row=row, column=col)
-            if isinstance(cell, MergedCell):
-                continue  # Skip merged cells
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Add borders
-    thin_border = Border(left=Side(style='thin'), 
-                         right=Side(style='thin'), 
-                         top=Side(style='thin'), 
-                         bottom=Side(style='thin'))
-
-    for row in ws.iter_rows(min_row=1, max_row=len(players)+2, min_col=1, max_col=len(headers)):
-        for cell in row:
-            cell.border = thin_border
-
-    # Save the workbook with the new filename
-    wb.save(new_filename)
-    return new_filename
 
-def main():
-    report_folder = r'C:\CF'
-    print(f"All reports will be saved to: {report_folder}")
-    
+# Full state snapshots are taken every few rounds; anything after the latest
+# one is replayed from the journal
+SNAPSHOT_INTERVAL = 3
+
+class TournamentJournal:
+    # Append-only record of everything that changes the tournament: the
+    # roster, each round's pairings and results, and which rounds have been
+    # saved to the workbook. Every event is fsync'd before the program moves
+    # on, so a crash or a 'Q' never loses more than the board being typed.
+    def __init__(self, path, truncate_at=None):
+        self.path = path
+        self.file = open(path, 'a+b')
+        self.lock = threading.Lock()
+        if truncate_at is not None:
+            self.file.truncate(truncate_at)  # Drop a half-written last event
+        self.file.seek(0, os.SEEK_END)
+
+    def append(self, event, **data):
+        data['event'] = event
+        with self.lock:  # The report writer thread appends 'saved' events
+            self.file.write(json.dumps(data).encode('utf-8') + b'\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def offset(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+def journal_path_for(filename):
+    return os.path.splitext(filename)[0] + ".journal.jsonl"
+
+def snapshot_path_for(journal_path):
+    return journal_path[:-len(".journal.jsonl")] + ".state.json"
+
+def write_snapshot(journal, num_rounds, filename, completed_round, players, played_matches, crosstable, seats=None,
+                   accelerated=None):
+    state = {
+        'journal_offset': journal.offset(),
+        'num_rounds': num_rounds,
+        'seats': seats,
+        'accelerated': accelerated,
+        'workbook': filename,
+        'completed_round': completed_round,
+        'players': [player.to_dict() for player in players],
+        'played': played_matches.opponents,
+        'crosstable': crosstable.rows,
+        'boards': crosstable.boards,
+    }
+    snapshot_file = snapshot_path_for(journal.path)
+    with open(snapshot_file + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(snapshot_file + ".tmp", snapshot_file)
+
+def find_unfinished_journal(report_folder=REPORT_FOLDER):
+    if not os.path.isdir(report_folder):
+        return None
+    journals = [os.path.join(report_folder, name) for name in os.listdir(report_folder)
+                if name.endswith(".journal.jsonl")]
+    if not journals:
+        return None
+
+    # Only the most recent event can still be in progress
+    path = max(journals, key=os.path.getmtime)
+    if journal_finished(path):
+        return None
+    return path
+
+def journal_finished(journal_path):
+    # A finished event's journal ends with its 'finish' event
+    with open(journal_path, 'rb') as f:
+        f.seek(max(0, os.path.getsize(journal_path) - 4096))
+        lines = f.read().splitlines()
+    return bool(lines) and b'"event": "finish"' in lines[-1]
+
+def upgrade_crosstable(crosstable, players):
+    # Snapshots from older versions name each opponent ("BYE" for a bye);
+    # the boards give the ids exactly, and names are the fallback where a
+    # snapshot predates them
+    ids_by_name = {player.name: player.id for player in players}
+    for rounds in crosstable.rows.values():
+        for entry in rounds.values():
+            if isinstance(entry[1], str):
+                entry[1] = ids_by_name.get(entry[1])
+    for round_number, boards in crosstable.boards.items():
+        for white_id, black_id in boards:
+            crosstable.rows[white_id][round_number][1] = black_id
+            if black_id is not None:
+                crosstable.rows[black_id][round_number][1] = white_id
+
+def restore_head_to_head(crosstable, players):
+    # Head-to-head results are keyed by opponent id, which a JSON snapshot
+    # turns into strings and older versions had as names, so they are
+    # rebuilt from the crosstable, which has both scores of every game
+    rows = crosstable.rows
+    for player in players:
+        player.head_to_head = {}
+        for round_number, (_, opponent, score) in sorted(rows.get(player.id, {}).items()):
+            if opponent is not None and score is not None:
+                player.head_to_head[opponent] = head_to_head_result(score, rows[opponent][round_number][2])
+
+def resume_tournament(journal_path):
+    # Rebuilds the in-memory tournament from the latest snapshot plus the
+    # journal events written after it
+    state = {
+        'num_rounds': 0,
+        'seats': None,
+        'accelerated': None,
+        'workbook': None,
+        'completed_round': 0,
+        'players': [],
+        'played_matches': None,
+        'crosstable': Crosstable(),
+        'pending_matches': None,  # Pairings of a round whose results never arrived
+        'unsaved_rounds': [],     # (round, matches, results) missing from the workbook
+    }
+    offset = 0
+    snapshot_file = snapshot_path_for(journal_path)
+    if os.path.exists(snapshot_file):
+        with open(snapshot_file, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        offset = snapshot['journal_offset']
+        state['num_rounds'] = snapshot['num_rounds']
+        state['seats'] = snapshot.get('seats')
+        state['accelerated'] = snapshot.get('accelerated')
+        state['workbook'] = snapshot['workbook']
+        state['completed_round'] = snapshot['completed_round']
+        state['players'] = [Player.from_dict(data) for data in snapshot['players']]
+        state['played_matches'] = PlayedMatches(len(state['players']))
+        state['played_matches'].opponents = snapshot['played']
+        state['crosstable'].rows = {int(player_id): {int(round_number): entry for round_number, entry in rounds.items()}
+                                    for player_id, rounds in snapshot['crosstable'].items()}
+        state['crosstable'].boards = {int(round_number): boards
+                                      for round_number, boards in snapshot.get('boards', {}).items()}
+        upgrade_crosstable(state['crosstable'], state['players'])
+        restore_head_to_head(state['crosstable'], state['players'])
+
+    players_by_id = {player.id: player for player in state['players']}
+    with open(journal_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Torn write from a crash; it is truncated on reopen
+            event = json.loads(line)
+            kind = event['event']
+            if kind == 'start':
+                state['num_rounds'] = event['num_rounds']
+                state['seats'] = event.get('seats')
+                state['accelerated'] = event.get('accelerated')
+                state['workbook'] = event['workbook']
+                # Journals from older versions have no keys
+                keys = event.get('keys') or [key for _, key in distinct_keys((name, '') for name in event['players'])]
+                state['players'] = [Player(i, name, key) for i, (name, key) in enumerate(zip(event['players'], keys))]
+                state['played_matches'] = PlayedMatches(len(state['players']))
+                players_by_id = {player.id: player for player in state['players']}
+            elif kind == 'pairings':
+                matches = []
+                for white_id, black_id in event['matches']:
+                    white = players_by_id[white_id]
+                    black = players_by_id[black_id] if black_id is not None else None
+                    if black is None:
+                        white.add_color('X')
+                    else:
+                        white.add_color('W')
+                        black.add_color('B')
+                    matches.append((white, black))
+                state['pending_matches'] = matches
+            elif kind == 'results':
+                matches = state['pending_matches']
+                results = [(players_by_id[p1], s1, players_by_id[p2] if p2 is not None else None, s2)
+                           for p1, s1, p2, s2 in event['results']]
+                update_scores(results, state['players'])
+                state['crosstable'].add_round(event['round'], matches, results)
+                for white, black in matches:
+                    if black is not None:
+                        state['played_matches'].add(white, black)
+                state['completed_round'] = event['round']
+                state['pending_matches'] = None
+                state['unsaved_rounds'].append((event['round'], matches, results))
+            elif kind == 'saved':
+                state['unsaved_rounds'] = [entry for entry in state['unsaved_rounds'] if entry[0] > event['round']]
+            offset += len(line)
+
+    # Journals from older versions may hold a workbook path relative to
+    # wherever they were started; the workbook always sits next to its journal
+    if state['workbook'] is not None and not os.path.isabs(state['workbook']):
+        state['workbook'] = os.path.join(os.path.dirname(os.path.abspath(journal_path)),
+                                         os.path.basename(state['workbook']))
+    state['journal'] = TournamentJournal(journal_path, truncate_at=offset)
+    return state
+
+class PhaseTracer:
+    # Times each phase of a round and appends one JSON line per phase and per
+    # round to a trace file kept next to the workbook. Setting CF_PROFILE=1
+    # also saves a cProfile dump for every round, and CF_TRACE_MEMORY=1
+    # records each round's peak allocation with tracemalloc.
+    def __init__(self, trace_file, profile=False, trace_memory=False):
+        self.trace_file = trace_file
+        self.file = open(trace_file, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profiler = None
+        self.round_start = None
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def record(self, event, **data):
+        data['event'] = event
+        data['time'] = datetime.now().isoformat(timespec='milliseconds')
+        with self.lock:  # Phases are timed on the report writer thread too
+            self.file.write(json.dumps(data) + "\n")
+            self.file.flush()
+
+    @contextmanager
+    def phase(self, name, round_number=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record('phase', round=round_number, phase=name, seconds=round(time.perf_counter() - start, 6))
+
+    def start_round(self, round_number):
+        self.round_start = time.perf_counter()
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        if self.profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def end_round(self, round_number):
+        data = {'round': round_number, 'seconds': round(time.perf_counter() - self.round_start, 6)}
+        if self.profiler is not None:
+            self.profiler.disable()
+            profile_file = f"{os.path.splitext(self.trace_file)[0]}.round{round_number}.prof"
+            self.profiler.dump_stats(profile_file)
+            self.profiler = None
+            data['profile'] = profile_file
+        if self.trace_memory:
+            import tracemalloc
+            data['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        self.record('round', **data)
+
+    def close(self):
+        self.file.close()
+
+def trace_path_for(filename):
+    return os.path.splitext(filename)[0] + ".trace.jsonl"
+
+class ReportWriter:
+    # Writes the workbook on a background thread so the arbiter never waits
+    # for openpyxl. Tasks run one at a time in the order they were queued,
+    # and only this thread touches the workbook once it has started, so
+    # everything handed to it must be a snapshot that later rounds won't
+    # change.
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                try:
+                    function(*args)
+                except Exception as e:
+                    print(f"\nAn error occurred while writing the reports: {str(e)}")
+            finally:
+                self.tasks.task_done()
+
+    def submit(self, function, *args):
+        self.tasks.put((function, args))
+
+    def flush(self):
+        self.tasks.join()
+
+    def close(self):
+        self.tasks.put(None)
+        self.thread.join()
+
+def round_snapshot(players, matches, results):
+    # Frozen copies of everything the round's sheets show
+    views = {player.id: player.snapshot() for player in players}
+    matches = [(views[white.id], views[black.id] if black is not None else None) for white, black in matches]
+    results = [(views[p1.id], s1, views[p2.id] if p2 is not None else None, s2) for p1, s1, p2, s2 in results]
+    standings = [views[player.id] for player in get_standings(players)]
+    return matches, results, standings
+
+def write_round_reports(wb, styles, filename, journal, tracer, round_number, matches, results, standings):
+    with tracer.phase('write_to_excel', round_number):
+        write_to_excel(wb, styles, matches, results, round_number)
+    with tracer.phase('update_standings', round_number):
+        update_standings(wb, styles, standings, round_number)
+    with tracer.phase('save', round_number):
+        wb.save(filename)
+    journal.append('saved', round=round_number)
+
+def write_final_summary(wb, styles, filename, tracer, standings, crosstable, num_rounds):
+    with tracer.phase('generate_summary'):
+        generate_summary(wb, styles, standings, crosstable, num_rounds)
+    with tracer.phase('save'):
+        wb.save(filename)
+
+def setup_new_tournament():
     num_players = get_number_of_players()
     players = get_players_from_excel(num_players)
+    load_player_ratings(players)
+
+    if len(players) <= ROUND_ROBIN_MAX_PLAYERS:
+        rr_rounds = round_robin_rounds(len(players))
+        answer = input(f"{len(players)} players can play a full round robin in {rr_rounds} rounds. "
+                       f"Play a round robin? (y/n): ")
+        if answer.strip().lower().startswith('y'):
+            return start_tournament(players, rr_rounds, seats=draw_seats(players))
     
     recommended_rounds = recommend_rounds(num_players)
     max_rounds = min(int(num_players * 0.4), 12)  # Enforce the 40% rule, capped at 12
@@ -549,53 +1502,387 @@ def main():
                 print(f"Please enter a number between 1 and {max_rounds}.")
         except ValueError:
             print("Please enter a valid number.")
+
+    accelerated = None
+    group = acceleration_group(players)
+    if len(players) >= ACCELERATED_MIN_PLAYERS and group:
+        answer = input(f"Use accelerated pairings? The top {len(group)} players by rating are paired with virtual "
+                       f"points for the first {(num_rounds + 1) // 2} rounds. (y/n): ")
+        if answer.strip().lower().startswith('y'):
+            accelerated = group
     
-    played_matches = set()
-    filename = None
-    all_matches = []
-    all_results = []
-
-    for round in range(1, num_rounds + 1):
-        print(f"\nRound {round}")
-        matches = create_matches(players, played_matches, round)
-        all_matches.append(matches)
-        
-        if not matches:
-            print("Unable to create matches. The tournament will end early.")
-            break
-        
-        display_matches(matches)
-        
-        filename = write_to_excel(players, matches, [], round)
-        print(f"Round {round} pairings have been written to {filename}")
-        
-        input("Press Enter when you're ready to enter the results for this round...")
+    return start_tournament(players, num_rounds, accelerated=accelerated)
+
+def start_tournament(players, num_rounds, report_folder=REPORT_FOLDER, seats=None, accelerated=None):
+    # seats holds the drawn seat order of a round robin, or None for Swiss;
+    # accelerated holds the ids of group A when a Swiss is accelerated. The
+    # workbook itself is only created once there is a report to write.
+    filename = tournament_filename(report_folder)
+    journal = TournamentJournal(journal_path_for(filename))
+    journal.append('start', players=[player.name for player in players], keys=[player.key for player in players],
+                   num_rounds=num_rounds, workbook=filename, seats=seats, accelerated=accelerated)
+    return {
+        'num_rounds': num_rounds,
+        'seats': seats,
+        'accelerated': accelerated,
+        'workbook': filename,
+        'completed_round': 0,
+        'players': players,
+        'played_matches': PlayedMatches(len(players)),
+        'crosstable': Crosstable(),
+        'pending_matches': None,
+        'unsaved_rounds': [],
+        'journal': journal,
+    }
+
+def open_tournament_workbook(state):
+    # The workbook of a new or resumed tournament, with any rounds the
+    # journal has but the workbook is missing written back into it
+    from openpyxl import Workbook, load_workbook
+    filename = state['workbook']
+    if os.path.exists(filename):
+        wb = load_workbook(filename)
+    else:
+        wb = Workbook()
+        wb.remove(wb.active)  # Remove the default sheet
+    styles = ReportStyles(wb)
+
+    if state['unsaved_rounds']:
+        for round, matches, results in state['unsaved_rounds']:
+            if f"Round {round} Results" not in wb.sheetnames:
+                write_to_excel(wb, styles, matches, results, round)
+        update_standings(wb, styles, get_standings(state['players']), state['completed_round'])
+        wb.save(filename)
+        state['journal'].append('saved', round=state['completed_round'])
+        state['unsaved_rounds'] = []
+    return wb, styles
+
+# Rating system whose stored ratings seed round 1
+SEEDING_SYSTEM = 'elo'
+
+def load_player_ratings(players):
+    # Stored ratings for the roster, if there is a player database yet
+    from player_db import PlayerDatabase, DATABASE_FILE
+    database_file = os.path.join(get_application_path(), DATABASE_FILE)
+    if not os.path.exists(database_file):
+        return
+    try:
+        with PlayerDatabase(database_file) as db:
+            ratings = db.latest_ratings([(player.name, player.key) for player in players], SEEDING_SYSTEM)
+    except Exception as e:
+        print(f"Could not read ratings from the player database {database_file}: {str(e)}")
+        return
+    for player in players:
+        if (player.name, player.key) in ratings:
+            player.rating = ratings[player.name, player.key][0]
+    if ratings:
+        print(f"{len(ratings)} of {len(players)} players have a rating; round 1 will be seeded by rating.")
+
+def save_to_player_database(state, section=None):
+    # Keeps the finished event's games for cross-event history and rates
+    # them. The reports are already saved, so a database problem only costs
+    # the history.
+    from player_db import PlayerDatabase, record_tournament, DATABASE_FILE
+    from ratings import rate_event
+    database_file = os.path.join(get_application_path(), DATABASE_FILE)
+    try:
+        with PlayerDatabase(database_file) as db:
+            event_id = record_tournament(db, state, section)
+            rate_event(db, event_id)
+        print(f"Games and ratings recorded in the player database {database_file}")
+    except Exception as e:
+        print(f"Could not record the games in the player database {database_file}: {str(e)}")
+
+def apply_results(state, round_number, matches, results):
+    # Journals a round's results and applies them to the standings, the
+    # crosstable and the record of who has met whom
+    state['journal'].append('results', round=round_number,
+                            results=[[p1.id, s1, p2.id if p2 is not None else None, s2]
+                                     for p1, s1, p2, s2 in results])
+    update_scores(results, state['players'])
+    state['crosstable'].add_round(round_number, matches, results)
+    for white, black in matches:
+        if black is not None:
+            state['played_matches'].add(white, black)
+    state['completed_round'] = round_number
+
+def close_tournament(state, section=None):
+    # Marks the event finished, then hands the results on to the exports and
+    # the player database
+    state['journal'].append('finish')
+    state['journal'].close()
+    export_results(state)
+    save_to_player_database(state, section)
+
+def export_results(state):
+    # TRF, JSON Lines and CSV copies of the results next to the workbook,
+    # for federation submission and the website
+    from exporters import export_tournament
+    try:
+        written = export_tournament(state)
+        print(f"Results exported to {', '.join(os.path.basename(path) for path in written)}")
+    except Exception as e:
+        print(f"Could not export the results: {str(e)}")
+
+def cli_state(parser, path):
+    # The tournament behind a journal, or behind the workbook it belongs to
+    journal_path = path if path.endswith(".journal.jsonl") else journal_path_for(path)
+    if not os.path.exists(journal_path):
+        parser.error(f"no tournament journal at {journal_path}")
+    state = resume_tournament(journal_path)
+    state['finished'] = journal_finished(journal_path)
+    return state
+
+def cli(argv=None):
+    # Headless use for scripts: each round is one 'pair' and one
+    # 'enter-results' call against the tournament's journal, so nothing is
+    # asked and openpyxl is only loaded when the workbook is written
+    parser = argparse.ArgumentParser(description="Run a tournament one step per call. Without arguments the "
+                                                 "program asks for everything interactively.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help="start a new tournament and print its journal file")
+    start.add_argument('roster', help="roster file (.xlsx, .csv or .jsonl)")
+    start.add_argument('--rounds', type=int, help="number of rounds (default: recommended for the field)")
+    start.add_argument('--players', type=int, help="only the first N players of the roster")
+    start.add_argument('--round-robin', action='store_true',
+                       help=f"everyone plays everyone (up to {ROUND_ROBIN_MAX_PLAYERS} players)")
+    start.add_argument('--accelerated', action='store_true',
+                       help="accelerated (Baku) pairings: the top half by rating gets virtual points early on")
+    start.add_argument('--folder', default=REPORT_FOLDER, help=f"reports folder (default: {REPORT_FOLDER})")
+    pair = commands.add_parser('pair', help="pair the next round")
+    enter = commands.add_parser('enter-results', help="apply the round's results from a CSV/JSONL file")
+    standings = commands.add_parser('standings', help="show the current standings")
+    export = commands.add_parser('export', help="write the results as TRF, JSON Lines, CSV or the workbook")
+    for command in (pair, enter, standings, export):
+        command.add_argument('journal', help="the tournament's .journal.jsonl file, or its workbook")
+    pair.add_argument('--json', action='store_true', help="print the boards as JSON")
+    enter.add_argument('source', help="results file with table and result columns, or '-' for stdin")
+    enter.add_argument('--reports', action='store_true', help="also write the round to the workbook")
+    standings.add_argument('--json', action='store_true', help="print the standings as JSON")
+    export.add_argument('--format', choices=('trf', 'jsonl', 'csv', 'xlsx'), nargs='+',
+                        default=['trf', 'jsonl', 'csv'])
+    export.add_argument('--output', help="folder for the TRF, JSON Lines and CSV files (default: next to the "
+                                         "workbook)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'start':
+        try:
+            entries = load_roster(args.roster)
+        except (OSError, ValueError) as e:
+            parser.error(f"could not read {args.roster}: {e}")
+        players = [Player(i, name, key)
+                   for i, (name, key) in enumerate(entries[:min(args.players or MAX_PLAYERS, MAX_PLAYERS)])]
+        if len(players) < 2:
+            parser.error(f"{args.roster} has {len(players)} player(s); a tournament needs at least 2")
+        accelerated = None
+        if args.accelerated:
+            if args.round_robin:
+                parser.error("--accelerated applies to Swiss events only")
+            with redirect_stdout(sys.stderr):  # Only the journal path goes to stdout
+                load_player_ratings(players)
+            accelerated = acceleration_group(players)
+            if not accelerated:
+                parser.error("accelerated pairings need ratings in the player database")
+        if args.round_robin:
+            if len(players) > ROUND_ROBIN_MAX_PLAYERS:
+                parser.error(f"round robins take at most {ROUND_ROBIN_MAX_PLAYERS} players, not {len(players)}")
+            num_rounds, seats = round_robin_rounds(len(players)), draw_seats(players)
+        else:
+            num_rounds, seats = args.rounds or recommend_rounds(len(players)), None
+            max_rounds = min(int(len(players) * 0.4), 12)  # The 40% rule, as when asked interactively
+            if not 1 <= num_rounds <= max(max_rounds, 1):
+                parser.error(f"--rounds must be between 1 and {max(max_rounds, 1)} for {len(players)} players")
+        os.makedirs(args.folder, exist_ok=True)
+        state = start_tournament(players, num_rounds, args.folder, seats, accelerated)
+        state['journal'].close()
+        print(state['journal'].path)
+        return 0
+
+    state = cli_state(parser, args.journal)
+    players = state['players']
+    round_number = state['completed_round'] + 1
+    try:
+        if args.command == 'pair':
+            if state['pending_matches'] is not None:
+                # Already paired; asking again shows the same boards
+                matches = state['pending_matches']
+            elif state['finished'] or round_number > state['num_rounds']:
+                print(f"The tournament is over after {state['completed_round']} of {state['num_rounds']} rounds.")
+                return 1
+            else:
+                if round_number == 1:
+                    # Ratings only seed round 1 and aren't journaled. Their
+                    # message goes to stderr, so --json output stays parseable.
+                    with redirect_stdout(sys.stderr):
+                        load_player_ratings(players)
+                matches = pair_round(state, round_number)
+                if not matches:
+                    print("Unable to create matches. The tournament will end early.")
+                    close_tournament(state)
+                    return 1
+                state['journal'].append('pairings', round=round_number,
+                                        matches=[[white.id, black.id if black is not None else None]
+                                                 for white, black in matches])
+            if args.json:
+                print(json.dumps({'round': round_number, 'boards': [
+                    {'table': table, 'white': white.name, 'black': black.name if black is not None else None}
+                    for table, (white, black) in enumerate(matches, start=1)]}, ensure_ascii=False))
+            else:
+                print(f"Round {round_number}")
+                display_matches(matches)
+
+        elif args.command == 'enter-results':
+            matches = state['pending_matches']
+            if matches is None:
+                print(f"Round {round_number} has not been paired yet.")
+                return 1
+            results, errors = load_round_results(matches, args.source)
+            if results is None:
+                print(f"{len(errors)} problem(s) found, no results were applied:")
+                for error in errors:
+                    print(f"  {error}")
+                return 1
+            apply_results(state, round_number, matches, results)
+            state['pending_matches'] = None
+            state['unsaved_rounds'].append((round_number, matches, results))
+            print(f"Round {round_number} results recorded for all {len(matches)} tables.")
+
+            last_round = round_number == state['num_rounds']
+            reports_failed = False
+            if args.reports:
+                # The results are journaled already, so a workbook that can't
+                # be written must not keep the event from being closed; the
+                # missing rounds are written by the next --reports or export
+                try:
+                    wb, styles = open_tournament_workbook(state)  # Writes every round not yet in the workbook
+                    if last_round:
+                        generate_summary(wb, styles, get_standings(players), state['crosstable'], state['num_rounds'])
+                        wb.save(state['workbook'])
+                    print(f"Reports written to {state['workbook']}")
+                except Exception as e:
+                    print(f"Could not write the reports to {state['workbook']}: {str(e)}", file=sys.stderr)
+                    reports_failed = True
+            # A snapshot must never claim rounds the workbook is still missing
+            if round_number % SNAPSHOT_INTERVAL == 0 and not state['unsaved_rounds']:
+                write_snapshot(state['journal'], state['num_rounds'], state['workbook'], round_number, players,
+                               state['played_matches'], state['crosstable'], state['seats'], state['accelerated'])
+            if last_round:
+                display_scores(players)
+                close_tournament(state)
+            if reports_failed:
+                return 1
+
+        elif args.command == 'standings':
+            if args.json:
+                print(json.dumps([dict(player.snapshot(), rank=rank)
+                                  for rank, player in enumerate(get_standings(players), start=1)],
+                                 ensure_ascii=False))
+            else:
+                print(f"After round {state['completed_round']} of {state['num_rounds']}")
+                display_scores(players)
+
+        else:
+            if 'xlsx' in args.format:
+                wb, styles = open_tournament_workbook(state)
+                if state['finished'] and "Tournament Summary" not in wb.sheetnames:
+                    generate_summary(wb, styles, get_standings(players), state['crosstable'], state['num_rounds'])
+                    wb.save(state['workbook'])
+                print(f"Exported {state['workbook']}")
+            from exporters import export_tournament
+            for path in export_tournament(state, args.format, args.output):
+                print(f"Exported {path}")
+    finally:
+        state['journal'].close()
+    return 0
+
+def main():
+    print(f"All reports will be saved to: {REPORT_FOLDER}")
+
+    state = None
+    journal_path = find_unfinished_journal()
+    if journal_path is not None:
+        answer = input(f"An unfinished tournament was found in {journal_path}. Resume it? (y/n): ")
+        if answer.strip().lower().startswith('y'):
+            state = resume_tournament(journal_path)
+            print(f"Resuming after round {state['completed_round']} of {state['num_rounds']}.")
+    if state is None:
+        state = setup_new_tournament()
+
+    players = state['players']
+    played_matches = state['played_matches']
+    crosstable = state['crosstable']
+    journal = state['journal']
+    num_rounds = state['num_rounds']
+    filename = state['workbook']
+    wb, styles = open_tournament_workbook(state)
+    tracer = PhaseTracer(trace_path_for(filename), profile=os.environ.get('CF_PROFILE') == '1',
+                         trace_memory=os.environ.get('CF_TRACE_MEMORY') == '1')
+
+    # Closing the writer waits for every queued report, so nothing is lost
+    # when the program stops early, including a 'Q' in play_match
+    writer = ReportWriter()
+    try:
+        for round in range(state['completed_round'] + 1, num_rounds + 1):
+            print(f"\nRound {round}")
+            tracer.start_round(round)
+            if state['pending_matches'] is not None:
+                # Paired before the restart; the colors are already handed out
+                matches = state['pending_matches']
+                state['pending_matches'] = None
+            else:
+                with tracer.phase('pairing', round):
+                    matches = pair_round(state, round)
         
-        results = play_match(matches)
-        all_results.append(results)
-        update_scores(results, players)
+                if not matches:
+                    print("Unable to create matches. The tournament will end early.")
+                    tracer.end_round(round)
+                    break
+
+                journal.append('pairings', round=round,
+                               matches=[[white.id, black.id if black is not None else None] for white, black in matches])
+
+            display_matches(matches)
         
-        filename = write_to_excel(players, matches, results, round)
-        print(f"Round {round} results have been written to {filename}")
+            with tracer.phase('results_entry', round):
+                results = enter_results(matches, round)
+            with tracer.phase('scoring', round):
+                apply_results(state, round, matches, results)
         
-        update_standings(players, filename, round)
-        print(f"Standings have been updated in {filename}")
+            # Pairings, results and standings go out in a single save per round,
+            # written in the background while the next round gets going
+            writer.submit(write_round_reports, wb, styles, filename, journal, tracer, round,
+                          *round_snapshot(players, matches, results))
+            print(f"Round {round} pairings, results and standings are being written to {filename}")
         
-        display_scores(players)
+            display_scores(players)
 
-        # Update played_matches after each round
-        for match in matches:
-            if match[1] is not None:
-                played_matches.add((match[0]['name'], match[1]['name']))
+            if round % SNAPSHOT_INTERVAL == 0:
+                # A snapshot must never claim a round whose reports are still queued
+                writer.flush()
+                with tracer.phase('snapshot', round):
+                    write_snapshot(journal, num_rounds, filename, round, players, played_matches, crosstable,
+                                   state['seats'], state['accelerated'])
+            tracer.end_round(round)
 
-    print("\nTournament completed. Final Standings:")
-    display_scores(players)
+        print("\nTournament completed. Final Standings:")
+        display_scores(players)
     
-    # Generate summary
-    summary_filename = generate_summary(players, all_matches, all_results, num_rounds, filename)
-    print(f"\nTournament summary has been added to {summary_filename}")
+        # Generate summary
+        writer.submit(write_final_summary, wb, styles, filename, tracer, get_standings(players), crosstable, num_rounds)
+    finally:
+        writer.close()
+    tracer.close()
+    print(f"\nTournament summary has been added to {filename}")
+    close_tournament(state)
     
     print("Thank you for using the Chess Tournament Manager!")
 
 if __name__ == "__main__":
+    # The pairing lookahead starts worker processes, which a PyInstaller
+    # bundle can only do with this in place
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(cli())
     main()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from CF_chess_management import (Player, PlayedMatches, Crosstable, ReportStyles, create_matches, update_scores,
+                                 compute_standings, match_result, create_tournament_workbook, write_to_excel,
+                                 update_standings, generate_summary, recommend_rounds)
+
+
+DEFAULT_SIZES = [16, 60, 500, 5000]
+PHASES = ['create_matches', 'update_scores', 'standings', 'write_to_excel', 'update_standings',
+          'generate_summary', 'save']
+
+# A phase only counts as a regression when it is both this much slower in
+# relative terms and slower by more than the absolute floor, so tiny phases
+# don't flag on timer noise
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR = 0.005  # seconds
+
+
+def run_tournament(num_players, num_rounds, seed, report_folder):
+    # One synthetic event from roster to summary, timing every phase of
+    # every round the way main runs them
+    random.seed(seed)
+    rng = random.Random(seed)
+    players = [Player(i, f"Player {i + 1}") for i in range(num_players)]
+    played_matches = PlayedMatches(num_players)
+    crosstable = Crosstable()
+    wb, filename = create_tournament_workbook(report_folder)
+    styles = ReportStyles(wb)
+    timings = {phase: [] for phase in PHASES}
+
+    def timed(phase, function, *args):
+        start = time.perf_counter()
+        value = function(*args)
+        timings[phase].append(time.perf_counter() - start)
+        return value
+
+    rounds_played = 0
+    for round_number in range(1, num_rounds + 1):
+        matches = timed('create_matches', create_matches, players, played_matches, round_number)
+        if not matches:
+            break
+        results = [(white, 2, None, 0) if black is None else match_result((white, black), rng.choice('12d'))
+                   for white, black in matches]
+        timed('update_scores', update_scores, results, players)
+        crosstable.add_round(round_number, matches, results)
+        for white, black in matches:
+            if black is not None:
+                played_matches.add(white, black)
+
+        standings = timed('standings', compute_standings, players)
+        timed('write_to_excel', write_to_excel, wb, styles, matches, results, round_number)
+        timed('update_standings', update_standings, wb, styles, standings, round_number)
+        timed('save', wb.save, filename)
+        rounds_played = round_number
+
+    timed('generate_summary', generate_summary, wb, styles, compute_standings(players), crosstable, rounds_played)
+    timed('save', wb.save, filename)
+    return timings, rounds_played
+
+
+def benchmark_field(num_players, num_rounds, seed, measure_memory=True):
+    with tempfile.TemporaryDirectory() as report_folder:
+        timings, rounds_played = run_tournament(num_players, num_rounds, seed, report_folder)
+
+    result = {
+        'players': num_players,
+        'rounds': rounds_played,
+        'phases': {phase: {'total': sum(times), 'max_round': max(times, default=0), 'per_round': times}
+                   for phase, times in timings.items()},
+    }
+
+    if measure_memory:
+        # Separate pass, since tracing allocations slows everything down
+        tracemalloc.start()
+        with tempfile.TemporaryDirectory() as report_folder:
+            run_tournament(num_players, num_rounds, seed, report_folder)
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for size, now in current.items():
+        before = baseline.get(size)
+        if before is None:
+            continue
+        for phase, stats in now['phases'].items():
+            old = before['phases'].get(phase, {}).get('total')
+            new = stats['total']
+            if old is not None and new > old * (1 + threshold) and new - old > NOISE_FLOOR:
+                regressions.append(f"{size} players, {phase}: {old:.3f}s -> {new:.3f}s ({new / old - 1:+.0%})")
+        old_memory = before.get('peak_memory')
+        new_memory = now.get('peak_memory')
+        if old_memory and new_memory and new_memory > old_memory * (1 + threshold):
+            regressions.append(f"{size} players, peak memory: {old_memory / 2**20:.1f} MiB -> "
+                               f"{new_memory / 2**20:.1f} MiB ({new_memory / old_memory - 1:+.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'Players':>7} {'Rounds':>6} " + " ".join(f"{phase:>16}" for phase in PHASES) + f" {'Peak MiB':>9}")
+    for result in results.values():
+        totals = " ".join(f"{result['phases'][phase]['total']:>15.3f}s" for phase in PHASES)
+        memory = result.get('peak_memory')
+        memory = f"{memory / 2**20:>9.1f}" if memory is not None else f"{'-':>9}"
+        print(f"{result['players']:>7} {result['rounds']:>6} {totals} {memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time pairing, scoring, standings and report generation "
+                                                 "on synthetic fields.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="field sizes to benchmark")
+    parser.add_argument('--rounds', type=int, help="rounds per event (default: recommend_rounds for each size)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory pass")
+    parser.add_argument('--output', help="write the results to this JSON file, e.g. to record a baseline")
+    parser.add_argument('--compare', help="baseline JSON to check these results against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default: 0.2)")
+    args = parser.parse_args()
+
+    results = {}
+    for num_players in args.sizes:
+        num_rounds = args.rounds or recommend_rounds(num_players)
+        print(f"Benchmarking {num_players} players over {num_rounds} rounds...")
+        results[str(num_players)] = benchmark_field(num_players, num_rounds, args.seed, not args.no_memory)
+
+    print()
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import random
+import argparse
+
+from CF_chess_management import Player, PlayedMatches, create_matches, update_scores, match_result
+from blossom import max_weight_matching
+
+
+def best_matching(num_vertices, edges, maxcardinality):
+    # (size, weight) of the best matching by trying every one of them; the
+    # size only counts when the largest matchings are wanted
+    weights = {}
+    for i, j, weight in edges:
+        weights[i, j] = weights[j, i] = weight
+    best = None
+
+    def extend(free, size, weight):
+        nonlocal best
+        key = (size if maxcardinality else 0, weight)
+        if best is None or key > best:
+            best = key
+        if free:
+            v, rest = free[0], free[1:]
+            extend(rest, size, weight)
+            for u in rest:
+                if (v, u) in weights:
+                    extend([w for w in rest if w != u], size + 1, weight + weights[v, u])
+
+    extend(list(range(num_vertices)), 0, 0)
+    return best
+
+
+def check_blossom(graphs, seed):
+    # max_weight_matching against brute force on small random graphs, with
+    # and without maxcardinality; returns the graphs checked
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(graphs):
+        num_vertices = rng.randint(2, 10)
+        density = rng.random()
+        edges = [(i, j, rng.randint(-5 if rng.random() < 0.2 else 0, 30))
+                 for i in range(num_vertices) for j in range(i + 1, num_vertices) if rng.random() < density]
+        if not edges:
+            continue
+        rng.shuffle(edges)
+        weights = {}
+        for i, j, weight in edges:
+            weights[i, j] = weights[j, i] = weight
+        for maxcardinality in (False, True):
+            mate = max_weight_matching(edges, maxcardinality)
+            size = weight = 0
+            for v, u in enumerate(mate):
+                if u >= 0:
+                    assert mate[u] == v and (v, u) in weights, f"not a matching: {edges} -> {mate}"
+                    if v < u:
+                        size += 1
+                        weight += weights[v, u]
+            found = (size if maxcardinality else 0, weight)
+            expected = best_matching(1 + max(max(i, j) for i, j, _ in edges), edges, maxcardinality)
+            assert found == expected, f"{edges} (maxcardinality={maxcardinality}): {found} != {expected}"
+        checked += 1
+    return checked
+
+
+def fresh_bye_possible(players, played_matches):
+    # Whether the round can be paired without rematches with the bye going
+    # to someone who hasn't had one: a perfect matching over the legal boards
+    # plus a bye vertex open to those players only
+    n = len(players)
+    edges = [(i, j, 1) for i in range(n) for j in range(i + 1, n)
+             if not played_matches.have_met(players[i], players[j])]
+    edges.extend((i, n, 1) for i, player in enumerate(players) if player.byes == 0)
+    mate = max_weight_matching(edges, maxcardinality=True)
+    return len(mate) == n + 1 and -1 not in mate
+
+
+def check_byes(field_sizes, events, seed):
+    # Plays odd-sized Swiss events with random results for as many rounds as
+    # the field allows, up to 12, and checks that every repeat bye was
+    # unavoidable. Returns the rounds played and the repeat byes seen.
+    rng = random.Random(seed)
+    rounds_played = repeat_byes = 0
+    for event in range(events):
+        num_players = rng.choice(field_sizes)
+        random.seed(seed + event)  # create_matches shuffles round 1 with the module-level generator
+        players = [Player(i, f"Player {i + 1}") for i in range(num_players)]
+        played_matches = PlayedMatches(num_players)
+        for round_number in range(1, min(num_players - 1, 12) + 1):
+            fresh = fresh_bye_possible(players, played_matches)
+            matches = create_matches(players, played_matches, round_number)
+            if not matches:
+                break
+            bye = next((white for white, black in matches if black is None), None)
+            if bye is not None and bye.byes > 1:
+                assert not fresh, (f"{num_players} players, event {event}, round {round_number}: "
+                                   f"{bye.name} had a second bye that could have been avoided")
+                repeat_byes += 1
+
+            results = [(white, 2, None, 0) if black is None else match_result((white, black), rng.choice('1d2'))
+                       for white, black in matches]
+            update_scores(results, players)
+            for white, black in matches:
+                if black is not None:
+                    played_matches.add(white, black)
+            rounds_played += 1
+    return rounds_played, repeat_byes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the pairing against exact answers on small cases.")
+    parser.add_argument('--graphs', type=int, default=3000, help="random graphs for the blossom check")
+    parser.add_argument('--events', type=int, default=100, help="simulated events for the bye check")
+    parser.add_argument('--players', type=int, nargs='+', default=[7, 9, 11, 21, 35, 47, 61],
+                        help="field sizes for the bye check; even sizes are made odd")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    if any(num_players < 3 for num_players in args.players):
+        parser.error("field sizes must be at least 3")
+
+    checked = check_blossom(args.graphs, args.seed)
+    print(f"Blossom matching agrees with brute force on {checked} graphs")
+    field_sizes = [num_players | 1 for num_players in args.players]
+    rounds_played, repeat_byes = check_byes(field_sizes, args.events, args.seed)
+    print(f"{args.events} events, {rounds_played} rounds: {repeat_byes} repeat byes, all unavoidable")
+
+
+if __name__ == "__main__":
+    main()
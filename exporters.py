@@ -0,0 +1,237 @@
+import os
+import csv
+import json
+import argparse
+from datetime import datetime
+
+from CF_chess_management import REPORT_FIELDS, get_standings, resume_tournament
+
+
+EXPORT_FORMATS = ('trf', 'jsonl', 'csv')
+
+# TRF-16 result codes for the points scored in a game (2 for a win, 1 for a
+# draw), and the code for a bye given by the pairing
+TRF_RESULTS = {2: '1', 1: '=', 0: '0'}
+TRF_BYE = 'U'
+
+# Fixed columns of a TRF-16 player record (001), first and last, counted
+# from 1 as in the FIDE specification. Readers go by column, so every field
+# is placed at its position rather than spaced out after the one before.
+TRF_PLAYER_COLUMNS = {
+    'start_number': (5, 8),
+    'sex': (10, 10),
+    'title': (11, 13),
+    'name': (15, 47),
+    'rating': (49, 52),
+    'federation': (54, 56),
+    'fide_id': (58, 68),
+    'birth_date': (70, 79),
+    'points': (81, 84),
+    'rank': (86, 89),
+}
+# Round blocks start at column 92 and repeat every 10 columns
+TRF_ROUND_COLUMNS = {'opponent': (92, 95), 'color': (97, 97), 'result': (99, 99)}
+TRF_ROUND_WIDTH = 10
+
+# Every exporter writes line by line from the tournament state, so the only
+# extra memory is an id lookup over the roster, whatever the field size.
+
+
+def event_name(state):
+    return os.path.splitext(os.path.basename(state['workbook']))[0]
+
+
+def event_start(state):
+    # Workbooks are named tournament_<YYYYmmdd_HHMMSS> when the event starts
+    try:
+        return datetime.strptime(event_name(state)[-15:], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.now()
+
+
+def tournament_type(state):
+    if state.get('seats') is not None:
+        return 'Round robin'
+    if state.get('accelerated'):
+        return 'Accelerated Swiss'
+    return 'Swiss'
+
+
+def rounds_played(state):
+    return max(state['crosstable'].boards, default=0)
+
+
+def boards(state):
+    # (round, table, white, black, white score, black score) for every board
+    # in table order; black is None and its score '-' for a bye
+    players_by_id = {player.id: player for player in state['players']}
+    rows = state['crosstable'].rows
+    for round_number, round_boards in sorted(state['crosstable'].boards.items()):
+        for table, (white_id, black_id) in enumerate(round_boards, start=1):
+            white = players_by_id[white_id]
+            white_score = rows[white_id][round_number][2]
+            if black_id is None:
+                yield round_number, table, white, None, white_score, '-'
+            else:
+                yield round_number, table, white, players_by_id[black_id], white_score, rows[black_id][round_number][2]
+
+
+def trf_place(line, columns, value):
+    # Writes value into its columns of line (a list of characters), text
+    # left-aligned and numbers right-aligned, as the specification shows them
+    first, last = columns
+    width = last - first + 1
+    text = str(value)[:width]
+    text = text.rjust(width) if isinstance(value, (int, float)) else text.ljust(width)
+    line.extend(' ' * (last - len(line)))
+    line[first - 1:last] = text
+
+
+def trf_player_line(fields, rounds):
+    # fields maps TRF_PLAYER_COLUMNS names to values; rounds holds an
+    # (opponent, color, result) block, or None, for every round
+    line = list("001")
+    for field, value in fields.items():
+        trf_place(line, TRF_PLAYER_COLUMNS[field], value)
+    for index, block in enumerate(rounds):
+        if block is None:
+            continue
+        offset = index * TRF_ROUND_WIDTH
+        for field, value in zip(('opponent', 'color', 'result'), block):
+            first, last = TRF_ROUND_COLUMNS[field]
+            trf_place(line, (first + offset, last + offset), value)
+    return ''.join(line).rstrip()
+
+
+def export_trf(path, state):
+    # FIDE TRF-16: header records, then one 001 line per player in start
+    # number order with a 10-column block per round. Start numbers follow
+    # the roster, so they are the player ids plus one, and opponents are
+    # taken from the boards by id; points are converted to one per win.
+    players = sorted(state['players'], key=lambda player: player.id)
+    ranks = {player.id: rank for rank, player in enumerate(get_standings(state['players']), start=1)}
+    rows = state['crosstable'].rows
+    num_rounds = rounds_played(state)
+    games = {}
+    for round_number, round_boards in state['crosstable'].boards.items():
+        for white_id, black_id in round_boards:
+            games[white_id, round_number] = (black_id, 'w')
+            if black_id is not None:
+                games[black_id, round_number] = (white_id, 'b')
+
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(f"012 {event_name(state)}\n")
+        f.write(f"042 {event_start(state):%Y/%m/%d}\n")
+        f.write(f"052 {datetime.now():%Y/%m/%d}\n")
+        f.write(f"062 {len(players)}\n")
+        f.write(f"072 {sum(1 for player in players if player.rating is not None)}\n")
+        f.write(f"092 {tournament_type(state)}\n")
+        f.write(f"XXR {state['num_rounds']}\n")
+        for player in players:
+            fields = {'start_number': player.id + 1, 'name': player.name,
+                      'points': player.score / 2, 'rank': ranks[player.id]}
+            if player.rating is not None:
+                fields['rating'] = round(player.rating)
+            rounds = []
+            for round_number in range(1, num_rounds + 1):
+                game = games.get((player.id, round_number))
+                if game is None:
+                    rounds.append(None)
+                elif game[0] is None:
+                    rounds.append(("0000", '-', TRF_BYE))
+                else:
+                    opponent_id, color = game
+                    rounds.append((opponent_id + 1, color, TRF_RESULTS.get(rows[player.id][round_number][2], ' ')))
+            f.write(trf_player_line(fields, rounds) + "\n")
+
+
+def export_jsonl(path, state):
+    # An event record, then every board, then every player in standings
+    # order with their crosstable row
+    rows = state['crosstable'].rows
+    names = {player.id: player.name for player in state['players']}
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'type': 'event', 'name': event_name(state), 'rounds': state['num_rounds'],
+                            'rounds_played': rounds_played(state), 'players': len(state['players']),
+                            'format': tournament_type(state).lower()}) + "\n")
+        for round_number, table, white, black, white_score, black_score in boards(state):
+            f.write(json.dumps({'type': 'pairing', 'round': round_number, 'table': table, 'white': white.name,
+                                'black': black.name if black is not None else None,
+                                'white_score': white_score,
+                                'black_score': black_score if black is not None else None},
+                               ensure_ascii=False) + "\n")
+        for rank, player in enumerate(get_standings(state['players']), start=1):
+            record = {'type': 'standing', 'rank': rank}
+            record.update((field, getattr(player, field)) for field in REPORT_FIELDS)
+            record['rounds'] = [{'round': round_number, 'color': color,
+                                 'opponent': names[opponent] if opponent is not None else "BYE", 'score': score}
+                                for round_number, (color, opponent, score) in sorted(rows.get(player.id, {}).items())]
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def export_csv(prefix, state):
+    # Three files next to each other: pairings, standings and crosstable,
+    # with the same columns as the workbook's sheets
+    with open(prefix + "_pairings.csv", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Round", "Table", "White", "Black", "White Score", "Black Score"])
+        for round_number, table, white, black, white_score, black_score in boards(state):
+            writer.writerow([round_number, table, white.name, black.name if black is not None else "BYE",
+                             white_score, black_score])
+
+    standings = get_standings(state['players'])
+    with open(prefix + "_standings.csv", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Rank", "Player", "Score", "Opponent Scores", "Wins", "Black Wins", "Byes",
+                         "Median Buchholz", "Sonneborn-Berger", "Progressive"])
+        for rank, player in enumerate(standings, start=1):
+            writer.writerow([rank, player.name, player.score, f"{player.opponent_scores:.2f}", player.wins,
+                             player.black_wins, player.byes, player.median_buchholz,
+                             f"{player.sonneborn_berger:.2f}", player.progressive])
+
+    num_rounds = rounds_played(state)
+    names = {player.id: player.name for player in state['players']}
+    with open(prefix + "_crosstable.csv", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Rank", "Player"] + [f"Round {i}" for i in range(1, num_rounds + 1)] + ["Total Score"])
+        for rank, player in enumerate(standings, start=1):
+            cells = [state['crosstable'].cell(player, round_number, names) or ""
+                     for round_number in range(1, num_rounds + 1)]
+            writer.writerow([rank, player.name] + cells + [player.score])
+
+
+def export_tournament(state, formats=EXPORT_FORMATS, output_folder=None):
+    # Writes the chosen formats next to the workbook, or into output_folder,
+    # and returns the files written
+    base = os.path.splitext(state['workbook'])[0]
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+        base = os.path.join(output_folder, os.path.basename(base))
+    written = []
+    if 'trf' in formats:
+        export_trf(base + ".trf", state)
+        written.append(base + ".trf")
+    if 'jsonl' in formats:
+        export_jsonl(base + ".jsonl", state)
+        written.append(base + ".jsonl")
+    if 'csv' in formats:
+        export_csv(base, state)
+        written.extend(base + suffix for suffix in ("_pairings.csv", "_standings.csv", "_crosstable.csv"))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a tournament as FIDE TRF-16, JSON Lines or CSV.")
+    parser.add_argument('journal', help="the tournament's .journal.jsonl file")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, nargs='+', default=list(EXPORT_FORMATS))
+    parser.add_argument('--output', help="folder for the exports (default: next to the workbook)")
+    args = parser.parse_args()
+
+    state = resume_tournament(args.journal)
+    state['journal'].close()
+    for path in export_tournament(state, args.format, args.output):
+        print(f"Exported {path}")
+
+
+if __name__ == "__main__":
+    main()
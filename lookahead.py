@@ -0,0 +1,210 @@
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from CF_chess_management import order_players, find_pairing, make_matches, total_cost
+
+
+# Seconds spent looking ahead per round, and how many alternative pairings
+# are weighed against the cheapest one
+LOOKAHEAD_BUDGET = 2.0
+LOOKAHEAD_CANDIDATES = 24
+
+# Search nodes between deadline checks
+DEADLINE_CHECK = 1024
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def legal_graph(players, played_matches):
+    # Who may still meet whom, as one bitset per place in the player order.
+    # An odd field gets an extra vertex for the bye, open to everyone who
+    # hasn't had one yet, so every round is a perfect matching of the graph.
+    n = len(players)
+    graph = []
+    for i, player in enumerate(players):
+        legal = 0
+        for j, opponent in enumerate(players):
+            if j != i and not played_matches.have_met(player, opponent):
+                legal |= 1 << j
+        graph.append(legal)
+    if n % 2 == 1:
+        fresh = [i for i, player in enumerate(players) if player.byes == 0] or range(n)
+        for i in fresh:
+            graph[i] |= 1 << n
+        graph.append(sum(1 << i for i in fresh))
+    return graph
+
+
+def remove_round(graph, pairs):
+    graph = list(graph)
+    for v, w in pairs:
+        graph[v] &= ~(1 << w)
+        graph[w] &= ~(1 << v)
+    return graph
+
+
+def find_rounds(graph, rounds, deadline):
+    # Looks for `rounds` perfect matchings of the graph that share no edge,
+    # i.e. that many more rounds without a rematch. Returns them as lists of
+    # vertex pairs, None if they can't exist, and raises SearchTimeout when
+    # the deadline passes first. Always extends the most constrained vertex
+    # first, which settles most fields almost at once.
+    everyone = (1 << len(graph)) - 1
+    nodes = [0]
+
+    def extend(unmatched, graph, pairs, rounds):
+        if unmatched == 0:
+            if rounds == 1:
+                return [pairs]
+            graph = remove_round(graph, pairs)
+            rest = start(graph, rounds - 1)
+            return [pairs] + rest if rest is not None else None
+
+        nodes[0] += 1
+        if nodes[0] % DEADLINE_CHECK == 0 and time.time() > deadline:
+            raise SearchTimeout()
+
+        vertex, fewest = None, None
+        remaining = unmatched
+        while remaining:
+            v = (remaining & -remaining).bit_length() - 1
+            remaining &= remaining - 1
+            count = bin(graph[v] & unmatched).count('1')
+            if count == 0:
+                return None
+            if fewest is None or count < fewest:
+                vertex, fewest = v, count
+
+        options = graph[vertex] & unmatched
+        while options:
+            w = (options & -options).bit_length() - 1
+            options &= options - 1
+            found = extend(unmatched & ~(1 << vertex) & ~(1 << w), graph, pairs + [(vertex, w)], rounds)
+            if found is not None:
+                return found
+        return None
+
+    def start(graph, rounds):
+        # Everyone needs an opponent (or the bye) in each remaining round
+        if any(bin(legal).count('1') < rounds for legal in graph):
+            return None
+        return extend(everyone, graph, [], rounds)
+
+    if rounds <= 0:
+        return []
+    return start(graph, rounds)
+
+
+def evaluate_candidate(task):
+    # Whether the rounds after this one can still all be paired once the
+    # candidate is played: True, False, or None when time ran out
+    graph, pairs, rounds_after, deadline = task
+    try:
+        return find_rounds(remove_round(graph, pairs), rounds_after, deadline) is not None
+    except SearchTimeout:
+        return None
+
+
+def rescue_pairing(task):
+    # The first round of a schedule that completes the event, found
+    # directly from the current graph; None if there is none in time
+    graph, rounds_left, deadline = task
+    try:
+        found = find_rounds(graph, rounds_left, deadline)
+    except SearchTimeout:
+        return None
+    return found[0] if found else None
+
+
+def candidate_pairings(players, played_matches, count, rng):
+    # The cheapest pairing, then variants of it with a few of its boards
+    # ruled out, which are the next cheapest ways to pair the round
+    def can_pair(player, opponent):
+        return not played_matches.have_met(player, opponent)
+
+    best = find_pairing(players, can_pair)
+    if best is None:
+        return []
+    candidates = {pairing_key(*best): best}
+    for _ in range(count * 3):
+        if len(candidates) >= count:
+            break
+        base_pairs = rng.choice(list(candidates.values()))[0]
+        if not base_pairs:
+            break
+        banned = {frozenset((a.id, b.id)) for a, b in rng.sample(base_pairs, min(len(base_pairs), rng.randint(1, 3)))}
+        solution = find_pairing(players, lambda a, b: can_pair(a, b) and frozenset((a.id, b.id)) not in banned)
+        if solution is not None:
+            candidates.setdefault(pairing_key(*solution), solution)
+    return list(candidates.values())
+
+
+def pairing_key(pairs, bye):
+    return frozenset(frozenset((a.id, b.id)) for a, b in pairs), bye.id if bye is not None else None
+
+
+def lookahead_matches(players, played_matches, round_number, num_rounds, budget=LOOKAHEAD_BUDGET,
+                      candidates=LOOKAHEAD_CANDIDATES, workers=None):
+    # Pairs the round like create_matches, but only commits to a pairing
+    # after checking that the rest of the event can still be paired without
+    # rematches. The cheapest pairing that passes wins; if none of the
+    # candidates can be cleared in time, a pairing taken from a complete
+    # schedule for the remaining rounds is used instead. workers=0 runs the
+    # checks in this process, for callers that are pool workers themselves.
+    order_players(players, round_number)
+    rng = random.Random(round_number)
+    options = candidate_pairings(players, played_matches, candidates, rng)
+    rounds_left = num_rounds - round_number + 1
+
+    graph = legal_graph(players, played_matches)
+    index = {player.id: i for i, player in enumerate(players)}
+    bye_vertex = len(players)
+
+    def vertex_pairs(pairs, bye):
+        edges = [(index[a.id], index[b.id]) for a, b in pairs]
+        if bye is not None:
+            edges.append((index[bye.id], bye_vertex))
+        return edges
+
+    deadline = time.time() + budget
+    tasks = [(graph, vertex_pairs(*option), rounds_left - 1, deadline) for option in options]
+    if workers == 0:
+        rescue = rescue_pairing((graph, rounds_left, deadline))
+        verdicts = [evaluate_candidate(task) for task in tasks]
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            rescue_future = pool.submit(rescue_pairing, (graph, rounds_left, deadline))
+            futures = [pool.submit(evaluate_candidate, task) for task in tasks]
+            # Tasks watch the deadline themselves; the margin covers start-up
+            wait(futures + [rescue_future], timeout=budget + 1)
+            verdicts = [future.result() if future.done() else None for future in futures]
+            rescue = rescue_future.result() if rescue_future.done() else None
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    feasible = [option for option, verdict in zip(options, verdicts) if verdict]
+    if feasible:
+        return make_matches(*min(feasible, key=lambda option: total_cost(*option)))
+
+    if rescue is not None:
+        pairs = []
+        bye = None
+        for v, w in rescue:
+            if bye_vertex in (v, w):
+                bye = players[v if w == bye_vertex else w]
+            else:
+                pairs.append((players[v], players[w]))
+        return make_matches(pairs, bye)
+
+    # Nothing could be confirmed either way: keep the candidates not known
+    # to fail, cheapest first, as create_matches would
+    undecided = [option for option, verdict in zip(options, verdicts) if verdict is None]
+    if undecided:
+        return make_matches(*min(undecided, key=lambda option: total_cost(*option)))
+    if options:
+        return make_matches(*min(options, key=lambda option: total_cost(*option)))
+    return []
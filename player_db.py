@@ -0,0 +1,286 @@
+import os
+import sqlite3
+import argparse
+from datetime import datetime
+
+
+DATABASE_FILE = "players.db"
+
+# Scores are stored in tournament points, as everywhere else: 2 for a win,
+# 1 for a draw. A bye is a game without a black player. A player is a name
+# plus the roster key that tells apart people of the same name.
+PLAYERS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    roster_key TEXT NOT NULL DEFAULT '',
+    UNIQUE (name, roster_key)
+);"""
+SCHEMA = PLAYERS_TABLE.format(name='players') + """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    section TEXT,
+    workbook TEXT NOT NULL UNIQUE,
+    num_rounds INTEGER NOT NULL,
+    finished TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events(id),
+    round INTEGER NOT NULL,
+    white_id INTEGER NOT NULL REFERENCES players(id),
+    black_id INTEGER REFERENCES players(id),
+    white_score INTEGER,
+    black_score INTEGER
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    id INTEGER PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    system TEXT NOT NULL,
+    period TEXT NOT NULL,
+    rating REAL NOT NULL,
+    deviation REAL,
+    volatility REAL,
+    games INTEGER NOT NULL DEFAULT 0,
+    provisional INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS games_event ON games (event_id, round);
+CREATE INDEX IF NOT EXISTS games_white ON games (white_id, black_id);
+CREATE INDEX IF NOT EXISTS games_black ON games (black_id, white_id);
+CREATE INDEX IF NOT EXISTS ratings_player ON ratings (player_id, system, period);
+"""
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+NAME_BATCH = 500
+
+
+class PlayerDatabase:
+    # Every finished event with its games, keyed by player name and roster
+    # key so the same person is one row across all events. Lookups go
+    # through the indexes on games, so they stay quick however many seasons
+    # are stored.
+    def __init__(self, path):
+        self.path = path
+        # Section workers may finish at the same moment, so writers wait for
+        # each other instead of failing on a locked database
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self.upgrade()
+
+    def upgrade(self):
+        # Databases from before roster keys have one player per name. Their
+        # players keep their ids and get the key '', which player_ids hands
+        # to the first roster entry of the name.
+        if any(column == 'roster_key' for _, column, *_ in self.conn.execute("PRAGMA table_info(players)")):
+            return
+        self.conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            with self.conn:
+                self.conn.execute(PLAYERS_TABLE.format(name='players_keyed'))
+                self.conn.execute("INSERT INTO players_keyed (id, name) SELECT id, name FROM players")
+                self.conn.execute("DROP TABLE players")
+                self.conn.execute("ALTER TABLE players_keyed RENAME TO players")
+        finally:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def player_ids(self, entries, register=False):
+        # Ids for roster entries given as (name, key) pairs. A player stored
+        # without a key is taken to be the first entry of that name, and
+        # keeps its key from then on when registering. Unknown entries are
+        # registered when asked to, and otherwise left out.
+        entries = list(dict.fromkeys((name, key) for name, key in entries))
+        requested = set(entries)
+        names = list(dict.fromkeys(name for name, _ in entries))
+        known = {}
+        for start in range(0, len(names), NAME_BATCH):
+            batch = names[start:start + NAME_BATCH]
+            rows = self.conn.execute("SELECT name, roster_key, id FROM players "
+                                     f"WHERE name IN ({','.join('?' * len(batch))})", batch)
+            known.update(((name, key), player_id) for name, key, player_id in rows)
+
+        ids = {}
+        first_entries = {}
+        for name, key in entries:
+            first_entries.setdefault(name, (name, key))
+        for name, key in entries:
+            if (name, key) in known:
+                ids[name, key] = known[name, key]
+            elif first_entries[name] == (name, key) and (name, '') in known and (name, '') not in requested:
+                ids[name, key] = known[name, '']
+                if register:
+                    self.conn.execute("UPDATE players SET roster_key = ? WHERE id = ?", (key, known[name, '']))
+            elif register:
+                ids[name, key] = self.conn.execute("INSERT INTO players (name, roster_key) VALUES (?, ?)",
+                                                   (name, key)).lastrowid
+        return ids
+
+    def find_player(self, name, key=None):
+        # The id of the player of that name, or None. A name that several
+        # players share needs their roster key.
+        rows = self.conn.execute("SELECT roster_key, id FROM players WHERE name = ? ORDER BY id", (name,)).fetchall()
+        if key is not None:
+            return next((player_id for player_key, player_id in rows if player_key == key), None)
+        if len(rows) > 1:
+            raise ValueError(f"{len(rows)} players are called {name}; pick one by roster key: "
+                             f"{', '.join(repr(player_key) for player_key, _ in rows)}")
+        return rows[0][1] if rows else None
+
+    def record_event(self, name, workbook, num_rounds, players, crosstable, section=None):
+        # Stores a finished event and all its games in one transaction.
+        # Recording the same workbook again changes nothing, so a rerun after
+        # a crash is safe. Returns the event's id.
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM events WHERE workbook = ?", (workbook,)).fetchone()
+            if row is not None:
+                return row[0]
+
+            ids = self.player_ids(((player['name'], player['key']) for player in players), register=True)
+            cursor = self.conn.execute(
+                "INSERT INTO events (name, section, workbook, num_rounds, finished) VALUES (?, ?, ?, ?, ?)",
+                (name, section, workbook, num_rounds, datetime.now().isoformat(timespec='seconds')))
+            event_id = cursor.lastrowid
+
+            # Every roster entry is its own database player, told apart from
+            # others of the same name by its roster key. Games are read from
+            # the boards by tournament id and only become database ids as the
+            # rows are written.
+            database_ids = {player['id']: ids[player['name'], player['key']] for player in players}
+            if len(set(database_ids.values())) < len(database_ids):
+                raise ValueError(f"two players of {workbook} share one entry in the player database")
+            rows = crosstable.rows
+            games = []
+            for round_number, boards in sorted(crosstable.boards.items()):
+                for white_id, black_id in boards:
+                    white_score = rows[white_id][round_number][2]
+                    if black_id is None:
+                        games.append((event_id, round_number, database_ids[white_id], None, white_score, None))
+                    else:
+                        games.append((event_id, round_number, database_ids[white_id], database_ids[black_id],
+                                      white_score, rows[black_id][round_number][2]))
+            self.conn.executemany("INSERT INTO games (event_id, round, white_id, black_id, white_score, black_score) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)", games)
+        return event_id
+
+    def head_to_head(self, name, opponent, name_key=None, opponent_key=None):
+        # Every game between the two, oldest first, as (event, round, white,
+        # black, white score, black score)
+        a, b = self.find_player(name, name_key), self.find_player(opponent, opponent_key)
+        if a is None or b is None:
+            return []
+        return self.conn.execute(
+            "SELECT e.name, g.round, w.name, bl.name, g.white_score, g.black_score "
+            "FROM games g JOIN events e ON e.id = g.event_id "
+            "JOIN players w ON w.id = g.white_id JOIN players bl ON bl.id = g.black_id "
+            "WHERE (g.white_id = ? AND g.black_id = ?) OR (g.white_id = ? AND g.black_id = ?) "
+            "ORDER BY e.finished, e.id, g.round", (a, b, b, a)).fetchall()
+
+    def color_history(self, name, last=None, key=None):
+        # The player's colors across all events, oldest first: 'W', 'B', or
+        # 'X' for a bye. last keeps only the most recent games.
+        player_id = self.find_player(name, key)
+        if player_id is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT CASE WHEN g.black_id IS NULL THEN 'X' WHEN g.white_id = ? THEN 'W' ELSE 'B' END "
+            "FROM games g JOIN events e ON e.id = g.event_id "
+            "WHERE g.white_id = ? OR g.black_id = ? "
+            "ORDER BY e.finished DESC, e.id DESC, g.round DESC" + (" LIMIT ?" if last else ""),
+            (player_id, player_id, player_id, last) if last else (player_id, player_id, player_id)).fetchall()
+        return [color for (color,) in reversed(rows)]
+
+    def latest_ratings(self, entries, system='elo'):
+        # (name, key) -> (rating, deviation, provisional) from each roster
+        # entry's latest rating period; unrated players are left out
+        entries_by_id = {player_id: entry for entry, player_id in self.player_ids(entries).items()}
+        player_ids = list(entries_by_id)
+        ratings = {}
+        for start in range(0, len(player_ids), NAME_BATCH):
+            batch = player_ids[start:start + NAME_BATCH]
+            rows = self.conn.execute(
+                "SELECT r.player_id, r.rating, r.deviation, r.provisional FROM ratings r "
+                f"WHERE r.player_id IN ({','.join('?' * len(batch))}) AND r.system = ? "
+                "AND r.id = (SELECT r2.id FROM ratings r2 WHERE r2.player_id = r.player_id AND r2.system = r.system "
+                "ORDER BY r2.period DESC, r2.id DESC LIMIT 1)", batch + [system])
+            for player_id, rating, deviation, provisional in rows:
+                ratings[entries_by_id[player_id]] = (rating, deviation, bool(provisional))
+        return ratings
+
+
+def record_tournament(db, state, section=None):
+    # Files a finished tournament from main or the section runner
+    name = os.path.splitext(os.path.basename(state['workbook']))[0]
+    return db.record_event(name, state['workbook'], state['num_rounds'], state['players'], state['crosstable'],
+                           section)
+
+
+def import_journals(database_file, journal_paths):
+    # Backfills events that finished before the database existed. Ratings
+    # are left to 'ratings.py recompute', so the events can come in any order.
+    from CF_chess_management import resume_tournament
+
+    for journal_path in journal_paths:
+        with open(journal_path, 'rb') as f:
+            lines = f.read().splitlines()
+        if not lines or b'"event": "finish"' not in lines[-1]:
+            print(f"Skipped {journal_path}: the event never finished")
+            continue
+        state = resume_tournament(journal_path)
+        state['journal'].close()
+        with PlayerDatabase(database_file) as db:
+            record_tournament(db, state)
+        print(f"Imported {journal_path}: {len(state['players'])} players, "
+              f"{state['completed_round']} of {state['num_rounds']} rounds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up players' history across all recorded events.")
+    parser.add_argument('--database', default=DATABASE_FILE, help=f"database file (default: {DATABASE_FILE})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    h2h = commands.add_parser('head-to-head', help="all games between two players")
+    h2h.add_argument('player')
+    h2h.add_argument('opponent')
+    h2h.add_argument('--player-key', help="roster key of the player, when several share the name")
+    h2h.add_argument('--opponent-key', help="roster key of the opponent, when several share the name")
+    colors = commands.add_parser('colors', help="a player's color history")
+    colors.add_argument('player')
+    colors.add_argument('--key', help="roster key of the player, when several share the name")
+    colors.add_argument('--last', type=int, help="only the most recent games")
+    backfill = commands.add_parser('import', help="record past events from their journal files")
+    backfill.add_argument('journals', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        import_journals(args.database, args.journals)
+        return
+
+    with PlayerDatabase(args.database) as db:
+        try:
+            if args.command == 'head-to-head':
+                games = db.head_to_head(args.player, args.opponent, args.player_key, args.opponent_key)
+            else:
+                history = db.color_history(args.player, args.last, args.key)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.command == 'head-to-head':
+            for event, round_number, white, black, white_score, black_score in games:
+                print(f"{event} round {round_number}: {white} {white_score} - {black_score} {black}")
+            print(f"{len(games)} game(s) between {args.player} and {args.opponent}.")
+        else:
+            print(f"{args.player}: {''.join(history) or 'no games recorded'} "
+                  f"({history.count('W')} white, {history.count('B')} black, {history.count('X')} byes)")
+
+
+if __name__ == "__main__":
+    main()
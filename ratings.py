@@ -0,0 +1,349 @@
+import os
+import csv
+import json
+import math
+import argparse
+from collections import defaultdict
+
+from player_db import PlayerDatabase, DATABASE_FILE
+
+
+SYSTEMS = ('elo', 'glicko2')
+PERIODS = ('event', 'month', 'year')
+
+INITIAL_RATING = 1500
+
+# Elo: a bigger K while a rating is still provisional, so newcomers find
+# their level quickly
+ELO_K_PROVISIONAL = 40
+ELO_K_ESTABLISHED = 20
+PROVISIONAL_GAMES = 20
+
+# Glicko-2, as in Glickman's paper; a rating stays provisional while its
+# deviation is above PROVISIONAL_DEVIATION. A deviation widens for the time
+# a player sat out, counted in calendar months (years when the periods are
+# years), not for other people's events.
+GLICKO_SCALE = 173.7178
+INITIAL_DEVIATION = 350
+INITIAL_VOLATILITY = 0.06
+GLICKO_TAU = 0.5
+PROVISIONAL_DEVIATION = 110
+CONVERGENCE = 1e-6
+
+
+def new_rating():
+    # [rating, deviation, volatility, games, last period rated or None]
+    return [INITIAL_RATING, INITIAL_DEVIATION, INITIAL_VOLATILITY, 0, None]
+
+
+def is_provisional(system, rating):
+    if system == 'elo':
+        return rating[3] < PROVISIONAL_GAMES
+    return rating[1] > PROVISIONAL_DEVIATION
+
+
+def elo_period(ratings, games, period):
+    # Every game of the period is scored against the ratings from before it,
+    # and all changes are applied together at the end
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    for white, black, white_score, black_score in games:
+        expected = 1 / (1 + 10 ** ((ratings[black][0] - ratings[white][0]) / 400))
+        actual = white_score / (white_score + black_score)
+        totals[white] += actual - expected
+        totals[black] += expected - actual
+        counts[white] += 1
+        counts[black] += 1
+
+    for player_id, total in totals.items():
+        rating = ratings[player_id]
+        k = ELO_K_PROVISIONAL if is_provisional('elo', rating) else ELO_K_ESTABLISHED
+        rating[0] += k * total
+        rating[3] += counts[player_id]
+    return totals.keys()
+
+
+def glicko_volatility(phi, sigma, delta, v):
+    # Step 5 of Glicko-2: the new volatility by the Illinois method
+    a = math.log(sigma ** 2)
+
+    def f(x):
+        ex = math.exp(x)
+        return (ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2)) - (x - a) / GLICKO_TAU ** 2
+
+    low = a
+    if delta ** 2 > phi ** 2 + v:
+        high = math.log(delta ** 2 - phi ** 2 - v)
+    else:
+        k = 1
+        while f(a - k * GLICKO_TAU) < 0:
+            k += 1
+        high = a - k * GLICKO_TAU
+    f_low, f_high = f(low), f(high)
+    while abs(high - low) > CONVERGENCE:
+        middle = low + (low - high) * f_low / (f_high - f_low)
+        f_middle = f(middle)
+        if f_middle * f_high <= 0:
+            low, f_low = high, f_high
+        else:
+            f_low /= 2
+        high, f_high = middle, f_middle
+    return math.exp(low / 2)
+
+
+def period_month(period):
+    # Months since year 0 at the start of a period key: "YYYY", "YYYY-MM" or
+    # an event's "YYYY-MM-DDTHH:MM:SS/id"
+    return int(period[:4]) * 12 + (int(period[5:7]) - 1 if len(period) > 4 else 0)
+
+
+def idle_periods(last, period):
+    # Whole months, or years for yearly periods, between the period a player
+    # was last rated in and this one, in which they had no games
+    months = period_month(period) - period_month(last)
+    if len(period) == 4:
+        return max(0, months // 12 - 1)
+    return max(0, months - 1)
+
+
+def glicko_period(ratings, games, period):
+    # One Glicko-2 rating period. Players who sat out earlier periods come
+    # back less certain: their deviation widens once per idle period before
+    # the games are scored. Players who sit this one out are left as they
+    # are until they play again, so rating one event on its own gives the
+    # same result as a full recompute.
+    opponents = defaultdict(list)
+    for white, black, white_score, black_score in games:
+        actual = white_score / (white_score + black_score)
+        opponents[white].append((black, actual))
+        opponents[black].append((white, 1 - actual))
+
+    for player_id in opponents:
+        rating = ratings[player_id]
+        if rating[4] is not None:
+            idle = idle_periods(rating[4], period)
+            if idle:
+                phi = rating[1] / GLICKO_SCALE
+                rating[1] = min(INITIAL_DEVIATION, GLICKO_SCALE * math.sqrt(phi ** 2 + idle * rating[2] ** 2))
+
+    updates = {}
+    for player_id, played in opponents.items():
+        rating, deviation, volatility, _, _ = ratings[player_id]
+        mu = (rating - INITIAL_RATING) / GLICKO_SCALE
+        phi = deviation / GLICKO_SCALE
+        v_inverse = 0
+        improvement = 0
+        for opponent_id, actual in played:
+            opponent = ratings[opponent_id]
+            opponent_mu = (opponent[0] - INITIAL_RATING) / GLICKO_SCALE
+            g = 1 / math.sqrt(1 + 3 * (opponent[1] / GLICKO_SCALE) ** 2 / math.pi ** 2)
+            expected = 1 / (1 + math.exp(-g * (mu - opponent_mu)))
+            v_inverse += g ** 2 * expected * (1 - expected)
+            improvement += g * (actual - expected)
+        v = 1 / v_inverse
+        sigma = glicko_volatility(phi, volatility, v * improvement, v)
+        phi_star = math.sqrt(phi ** 2 + sigma ** 2)
+        new_phi = 1 / math.sqrt(1 / phi_star ** 2 + 1 / v)
+        new_mu = mu + new_phi ** 2 * improvement
+        updates[player_id] = (INITIAL_RATING + GLICKO_SCALE * new_mu, GLICKO_SCALE * new_phi, sigma, len(played))
+
+    for player_id, (new_rating, new_deviation, new_volatility, played) in updates.items():
+        rating = ratings[player_id]
+        rating[0], rating[1], rating[2] = new_rating, new_deviation, new_volatility
+        rating[3] += played
+    return updates.keys()
+
+
+RATING_PERIODS = {'elo': elo_period, 'glicko2': glicko_period}
+
+
+def rate_periods(system, periods, ratings=None):
+    # Runs the periods in order and returns the final ratings plus one row
+    # per player per period they played in, ready for the ratings table
+    ratings = ratings if ratings is not None else {}
+    rate = RATING_PERIODS[system]
+    rows = []
+    for period, games in periods:
+        for white, black, _, _ in games:
+            if white not in ratings:
+                ratings[white] = new_rating()
+            if black not in ratings:
+                ratings[black] = new_rating()
+        for player_id in rate(ratings, games, period):
+            rating = ratings[player_id]
+            rating[4] = period
+            rows.append((player_id, system, period, rating[0], rating[1] if system == 'glicko2' else None,
+                         rating[2] if system == 'glicko2' else None, rating[3], int(is_provisional(system, rating))))
+    return ratings, rows
+
+
+def period_key(grouping, finished, event_id):
+    # Keys sort in time order. Each event is its own period by default; the
+    # event id keeps events that finished in the same second apart.
+    if grouping == 'month':
+        return finished[:7]
+    if grouping == 'year':
+        return finished[:4]
+    return f"{finished}/{event_id}"
+
+
+def load_periods(db, grouping, event_id=None):
+    # Rated games grouped into periods; byes and unfinished boards don't count
+    query = ("SELECT e.id, e.finished, g.white_id, g.black_id, g.white_score, g.black_score "
+             "FROM games g JOIN events e ON e.id = g.event_id "
+             "WHERE g.black_id IS NOT NULL AND g.white_score + g.black_score > 0")
+    arguments = ()
+    if event_id is not None:
+        query += " AND e.id = ?"
+        arguments = (event_id,)
+    periods = {}
+    for event, finished, white, black, white_score, black_score in db.conn.execute(
+            query + " ORDER BY e.finished, e.id, g.round", arguments):
+        periods.setdefault(period_key(grouping, finished, event), []).append(
+            (white, black, white_score, black_score))
+    return list(periods.items())
+
+
+def insert_ratings(db, rows):
+    db.conn.executemany("INSERT INTO ratings (player_id, system, period, rating, deviation, volatility, games, "
+                        "provisional) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def recompute_ratings(db, system, grouping='event'):
+    # Rebuilds a system's whole rating history from the stored games in one
+    # transaction. Returns the number of players rated.
+    periods = load_periods(db, grouping)
+    ratings, rows = rate_periods(system, periods)
+    with db.conn:
+        db.conn.execute("DELETE FROM ratings WHERE system = ?", (system,))
+        insert_ratings(db, rows)
+    return len(ratings)
+
+
+def current_ratings(db, player_ids, system):
+    # Each player's latest rating as [rating, deviation, volatility, games,
+    # period]
+    ratings = {}
+    player_ids = list(player_ids)
+    for start in range(0, len(player_ids), 500):
+        batch = player_ids[start:start + 500]
+        rows = db.conn.execute(
+            "SELECT r.player_id, r.rating, r.deviation, r.volatility, r.games, r.period FROM ratings r "
+            f"WHERE r.player_id IN ({','.join('?' * len(batch))}) AND r.system = ? "
+            "AND r.id = (SELECT r2.id FROM ratings r2 WHERE r2.player_id = r.player_id AND r2.system = r.system "
+            "ORDER BY r2.period DESC, r2.id DESC LIMIT 1)", batch + [system])
+        for player_id, rating, deviation, volatility, games, period in rows:
+            ratings[player_id] = [rating,
+                                  deviation if deviation is not None else INITIAL_DEVIATION,
+                                  volatility if volatility is not None else INITIAL_VOLATILITY,
+                                  games, period]
+    return ratings
+
+
+def rate_event(db, event_id):
+    # Rates one newly recorded event as its own period in every system, on
+    # top of the players' current ratings. An event that already has its
+    # ratings is left alone.
+    periods = load_periods(db, 'event', event_id)
+    if not periods:
+        return
+    period = periods[0][0]
+    player_ids = {player_id for game in periods[0][1] for player_id in game[:2]}
+    with db.conn:
+        for system in SYSTEMS:
+            if db.conn.execute("SELECT 1 FROM ratings WHERE system = ? AND period = ? LIMIT 1",
+                               (system, period)).fetchone():
+                continue
+            _, rows = rate_periods(system, periods, current_ratings(db, player_ids, system))
+            insert_ratings(db, rows)
+
+
+def write_roster_ratings(roster_file, ratings):
+    # Adds or refreshes Rating and Provisional columns in the roster, for
+    # every entry that has a rating. ratings maps (name, key) -> (rating,
+    # deviation, provisional), as from PlayerDatabase.latest_ratings; the
+    # keys are matched up with the named rows in file order, as read_roster
+    # gives them.
+    from CF_chess_management import read_roster
+    entries = iter(read_roster(roster_file))
+
+    def entry_rating(name):
+        return ratings.get(tuple(next(entries))) if name else None
+
+    extension = os.path.splitext(roster_file)[1].lower()
+    if extension == '.csv':
+        with open(roster_file, newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        header = [column.strip().lower() for column in rows[0]] if rows else []
+        name_column = header.index('name') if 'name' in header else min(1, len(header) - 1)
+        for column in ('rating', 'provisional'):
+            if column not in header:
+                header.append(column)
+                rows[0].append(column.capitalize())
+        rating_column, provisional_column = header.index('rating'), header.index('provisional')
+        for row in rows[1:]:
+            row.extend([''] * (len(header) - len(row)))
+            rating = entry_rating(row[name_column].strip()) if len(row) > name_column else None
+            if rating is not None:
+                row[rating_column] = str(round(rating[0]))
+                row[provisional_column] = 'yes' if rating[2] else 'no'
+        with open(roster_file, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+    elif extension == '.jsonl':
+        entries = []
+        with open(roster_file, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.append(entry if isinstance(entry, dict) else {'name': entry})
+        for entry in entries:
+            rating = entry_rating(entry.get('name'))
+            if rating is not None:
+                entry['rating'] = round(rating[0])
+                entry['provisional'] = rating[2]
+        with open(roster_file, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(roster_file)
+        ws = wb.active
+        headers = {str(cell.value).strip().lower(): cell.column for cell in ws[1] if cell.value is not None}
+        for column in ('rating', 'provisional'):
+            if column not in headers:
+                headers[column] = max(ws.max_column, 2) + 1
+                ws.cell(row=1, column=headers[column], value=column.capitalize())
+        for row in range(2, ws.max_row + 1):
+            rating = entry_rating(ws.cell(row=row, column=2).value)
+            if rating is not None:
+                ws.cell(row=row, column=headers['rating'], value=round(rating[0]))
+                ws.cell(row=row, column=headers['provisional'], value='yes' if rating[2] else 'no')
+        wb.save(roster_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute Elo and Glicko-2 ratings from the recorded games.")
+    parser.add_argument('--database', default=DATABASE_FILE, help=f"database file (default: {DATABASE_FILE})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    recompute = commands.add_parser('recompute', help="rebuild the rating history from every stored game")
+    recompute.add_argument('--system', choices=SYSTEMS + ('all',), default='all')
+    recompute.add_argument('--period', choices=PERIODS, default='event',
+                           help="how games are grouped into rating periods (default: event)")
+    roster = commands.add_parser('roster', help="write the current ratings into a roster file")
+    roster.add_argument('roster_file')
+    roster.add_argument('--system', choices=SYSTEMS, default='elo')
+    args = parser.parse_args()
+
+    with PlayerDatabase(args.database) as db:
+        if args.command == 'recompute':
+            for system in (SYSTEMS if args.system == 'all' else (args.system,)):
+                count = recompute_ratings(db, system, args.period)
+                print(f"{system}: {count} players rated")
+        else:
+            from CF_chess_management import read_roster
+            ratings = db.latest_ratings(read_roster(args.roster_file), args.system)
+            write_roster_ratings(args.roster_file, ratings)
+            print(f"{len(ratings)} {args.system} ratings written to {args.roster_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from CF_chess_management import Player, PlayedMatches, create_matches, parse_result_row, round_results
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+WINNER_LABELS = {'1': '1-0', '2': '0-1', 'd': '1/2-1/2'}
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict'}
+
+
+class RoundService:
+    # One round's boards as seen by the table arbiters. Everything runs on the
+    # event loop, so submissions never need a lock. Sending the same result
+    # for a board again is harmless; a different result for a board that
+    # already has one is refused as a conflict for the chief arbiter to sort
+    # out. The round closes by itself once every board has a result.
+    def __init__(self, matches, round_number):
+        self.matches = matches
+        self.round_number = round_number
+        self.winners = {}
+        self.conflicts = []
+        self.boards = {table for table, match in enumerate(matches, start=1) if match[1] is not None}
+        self.closed = asyncio.Event()
+        if not self.boards:
+            self.closed.set()
+
+    def pairings(self):
+        boards = []
+        for table, (white, black) in enumerate(self.matches, start=1):
+            boards.append({
+                'table': table,
+                'white': white['name'],
+                'black': black['name'] if black is not None else "BYE",
+                'result': WINNER_LABELS.get(self.winners.get(table)),
+            })
+        return {'round': self.round_number, 'remaining': len(self.boards) - len(self.winners), 'boards': boards}
+
+    def submit(self, row):
+        if self.closed.is_set():
+            return 409, {'status': 'closed', 'error': f"round {self.round_number} is already closed"}
+        table, winner, errors = parse_result_row(self.matches, row)
+        if errors:
+            return 400, {'status': 'invalid', 'errors': errors}
+
+        recorded = self.winners.get(table)
+        if recorded == winner:
+            return 200, {'status': 'duplicate', 'table': table, 'result': WINNER_LABELS[winner]}
+        if recorded is not None:
+            self.conflicts.append((table, recorded, winner))
+            print(f"Conflict on table {table}: {WINNER_LABELS[recorded]} is recorded, "
+                  f"{WINNER_LABELS[winner]} was submitted and refused.")
+            return 409, {'status': 'conflict', 'table': table, 'result': WINNER_LABELS[recorded],
+                         'submitted': WINNER_LABELS[winner]}
+
+        self.winners[table] = winner
+        remaining = len(self.boards) - len(self.winners)
+        white, black = self.matches[table - 1]
+        print(f"Table {table}: {white['name']} vs {black['name']} {WINNER_LABELS[winner]} ({remaining} left)")
+        if remaining == 0:
+            self.closed.set()
+        return 201, {'status': 'accepted', 'table': table, 'result': WINNER_LABELS[winner], 'remaining': remaining}
+
+    def route(self, method, path, body):
+        if method == 'GET' and path == '/pairings':
+            return 200, self.pairings()
+        if method == 'POST' and path == '/results':
+            try:
+                row = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'status': 'invalid', 'errors': ["body is not valid JSON"]}
+            if not isinstance(row, dict):
+                return 400, {'status': 'invalid', 'errors': ["expected a JSON object with table and result"]}
+            return self.submit({str(key).lower(): value for key, value in row.items()})
+        return 404, {'error': f"no such endpoint: {method} {path}"}
+
+    async def handle(self, reader, writer):
+        # Just enough HTTP/1.1 for one JSON request per connection
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            method, path = request_line.split()[:2]
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            status, payload = self.route(method, path, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {'error': "malformed request"}
+
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def run_service(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port, backlog=1024)
+    async with server:
+        await service.closed.wait()
+
+
+def serve_round(matches, round_number, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    # Blocks until every board of the round has a result, then returns the
+    # results in the same form as play_match
+    async def main():
+        service = RoundService(matches, round_number)
+        print(f"Collecting round {round_number} results on http://{host}:{port} "
+              f"(GET /pairings, POST /results)")
+        await run_service(service, host, port)
+        if service.conflicts:
+            print(f"{len(service.conflicts)} conflicting submission(s) were refused; please check those tables.")
+        return service.winners
+
+    winners = asyncio.run(main())
+    return round_results(matches, winners)
+
+
+async def request(host, port, method, path, payload=None):
+    # Stand-in for a table arbiter's tablet
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(data)
+
+
+async def demo(num_players, host, port, seed):
+    # Pairs a synthetic field, then has every board reported at once, with
+    # a share of duplicate and conflicting submissions mixed in
+    random.seed(seed)
+    players = [Player(i, f"Player {i + 1}") for i in range(num_players)]
+    matches = create_matches(players, PlayedMatches(num_players), 1)
+    service = RoundService(matches, 1)
+    server_task = asyncio.create_task(run_service(service, host, port))
+    await asyncio.sleep(0.1)
+
+    status, pairings = await request(host, port, 'GET', '/pairings')
+    submissions = [{'table': board['table'], 'white': board['white'], 'black': board['black'],
+                    'result': random.choice(['1-0', '0-1', '1/2-1/2'])}
+                   for board in pairings['boards'] if board['black'] != "BYE"]
+    random.shuffle(submissions)
+    # The last few boards are held back so the round stays open while the
+    # repeats and conflicts arrive alongside the first reports
+    held_back, opening = submissions[:5], submissions[5:]
+    repeats = opening[:len(opening) // 5]
+    conflicts = [dict(row, result='1-0' if row['result'] != '1-0' else '0-1') for row in opening[:5]]
+
+    start = time.perf_counter()
+    first = await asyncio.gather(*(request(host, port, 'POST', '/results', row)
+                                   for row in opening + repeats + conflicts))
+    last = await asyncio.gather(*(request(host, port, 'POST', '/results', row) for row in held_back))
+    await asyncio.wait_for(server_task, timeout=5)
+    elapsed = time.perf_counter() - start
+
+    statuses = [status for status, _ in first + last]
+    print(f"\n{len(statuses)} submissions for {len(submissions)} boards in {elapsed:.3f}s: "
+          f"{statuses.count(201)} accepted, {statuses.count(200)} duplicates, {statuses.count(409)} refused")
+    print(f"Round closed: {service.closed.is_set()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect one round's results from table arbiters over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--demo', type=int, metavar='PLAYERS',
+                        help="pair a synthetic field and submit every board concurrently")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.demo:
+        asyncio.run(demo(args.demo, args.host, args.port, args.seed))
+    else:
+        parser.error("the service is started from the results prompt; use --demo to try it standalone")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import re
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from CF_chess_management import (Player, MAX_PLAYERS, REPORT_FOLDER, SNAPSHOT_INTERVAL, ROUND_ROBIN_MAX_PLAYERS,
+                                 ReportStyles, SheetWriter, load_roster, recommend_rounds, round_robin_rounds,
+                                 draw_seats, acceleration_group, pair_round, apply_results, get_standings,
+                                 start_tournament, open_tournament_workbook, find_unfinished_journal,
+                                 resume_tournament, load_round_results, enter_results, display_matches,
+                                 round_snapshot, write_round_reports, write_final_summary, write_snapshot,
+                                 load_player_ratings, close_tournament, PhaseTracer, trace_path_for)
+
+
+# Section names become folder and sheet names, so they are kept to
+# characters both accept
+SECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9 _-]{0,30}$")
+
+DASHBOARD_FILE = "dashboard.xlsx"
+
+
+# Each section lives in its own worker process for the whole event: the
+# players, pairing index, workbook and journal never leave it, and only
+# pairings, results and standings rows cross the process boundary.
+_section = {}
+
+
+def open_section(name, roster_file, num_rounds, report_folder, round_robin=False, fresh=False, accelerated=False):
+    # Starts the section's tournament in report_folder, or picks up an
+    # unfinished one found there. A round-robin section always plays the
+    # full schedule, whatever its rounds setting; an accelerated one needs
+    # ratings to split the field.
+    journal_path = None if fresh else find_unfinished_journal(report_folder)
+    if journal_path is not None:
+        state = resume_tournament(journal_path)
+    else:
+        entries = load_roster(roster_file)
+        players = [Player(i, name, key) for i, (name, key) in enumerate(entries[:MAX_PLAYERS])]
+        if len(players) < 2:
+            raise ValueError(f"{roster_file} has {len(players)} player(s); a section needs at least 2")
+        load_player_ratings(players)
+        if not round_robin:
+            group = acceleration_group(players) if accelerated else None
+            if accelerated and not group:
+                raise ValueError(f"{name} is accelerated, but none of its players has a rating")
+            state = start_tournament(players, num_rounds or recommend_rounds(len(players)), report_folder,
+                                     accelerated=group)
+        elif len(players) > ROUND_ROBIN_MAX_PLAYERS:
+            raise ValueError(f"{name} has {len(players)} players; round robins take at most {ROUND_ROBIN_MAX_PLAYERS}")
+        else:
+            state = start_tournament(players, round_robin_rounds(len(players)), report_folder,
+                                     seats=draw_seats(players))
+
+    wb, styles = open_tournament_workbook(state)
+    tracer = PhaseTracer(trace_path_for(state['workbook']), profile=os.environ.get('CF_PROFILE') == '1',
+                         trace_memory=os.environ.get('CF_TRACE_MEMORY') == '1')
+    _section.update(name=name, state=state, wb=wb, styles=styles, tracer=tracer, matches=None)
+    return {
+        'players': len(state['players']),
+        'num_rounds': state['num_rounds'],
+        'completed_round': state['completed_round'],
+        'workbook': state['workbook'],
+        'resumed': journal_path is not None,
+        'standings': standings_rows(state['players']),
+    }
+
+
+def standings_rows(players):
+    return [dict(player.snapshot()) for player in get_standings(players)]
+
+
+def pair_section(round_number):
+    # Pairs the section's next round and returns the boards as plain
+    # id/name dicts, or None when no legal pairing is left
+    state = _section['state']
+    tracer = _section['tracer']
+    tracer.start_round(round_number)
+    if state['pending_matches'] is not None:
+        # Paired before the restart; the colors are already handed out
+        matches = state['pending_matches']
+        state['pending_matches'] = None
+    else:
+        with tracer.phase('pairing', round_number):
+            matches = pair_round(state, round_number)
+        if not matches:
+            tracer.end_round(round_number)
+            return None
+        state['journal'].append('pairings', round=round_number,
+                                matches=[[white.id, black.id if black is not None else None]
+                                         for white, black in matches])
+
+    _section['matches'] = matches
+    return [({'id': white.id, 'name': white.name},
+             {'id': black.id, 'name': black.name} if black is not None else None)
+            for white, black in matches]
+
+
+def score_section(round_number, results):
+    # Applies a round's results, given as [player id, score, opponent id,
+    # score] rows, writes the round's sheets and returns the new standings
+    state = _section['state']
+    tracer = _section['tracer']
+    journal = state['journal']
+    players = state['players']
+    matches = _section['matches']
+
+    # create_matches reorders the player list, so players are found by id
+    players_by_id = {player.id: player for player in players}
+    results = [(players_by_id[p1], s1, players_by_id[p2] if p2 is not None else None, s2)
+               for p1, s1, p2, s2 in results]
+    with tracer.phase('scoring', round_number):
+        apply_results(state, round_number, matches, results)
+
+    # The worker is already running alongside the other sections, so the
+    # reports are written here rather than on a writer thread
+    write_round_reports(_section['wb'], _section['styles'], state['workbook'], journal, tracer, round_number,
+                        *round_snapshot(players, matches, results))
+    if round_number % SNAPSHOT_INTERVAL == 0:
+        with tracer.phase('snapshot', round_number):
+            write_snapshot(journal, state['num_rounds'], state['workbook'], round_number, players,
+                           state['played_matches'], state['crosstable'], state['seats'], state['accelerated'])
+    tracer.end_round(round_number)
+    return standings_rows(players)
+
+
+def finish_section():
+    state = _section['state']
+    write_final_summary(_section['wb'], _section['styles'], state['workbook'], _section['tracer'],
+                        get_standings(state['players']), state['crosstable'], state['num_rounds'])
+    _section['tracer'].close()
+    close_tournament(state, _section['name'])
+    return state['workbook']
+
+
+def load_sections(config_file):
+    # {"sections": [{"name": "Open", "roster": "open.xlsx", "rounds": 7}, ...]}
+    # Roster paths are relative to the config file; rounds is optional, and
+    # "round_robin": true plays a small section as a full round robin, and
+    # "accelerated": true gives a large one accelerated pairings.
+    with open(config_file, encoding='utf-8') as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.abspath(config_file))
+
+    sections = []
+    for entry in config.get('sections', []):
+        name = str(entry.get('name', '')).strip()
+        if not SECTION_NAME.match(name):
+            raise ValueError(f"invalid section name {name!r}: use up to 31 letters, digits, spaces, '-' or '_'")
+        if any(section['name'].lower() == name.lower() for section in sections):
+            raise ValueError(f"section {name!r} is listed twice")
+        if not entry.get('roster'):
+            raise ValueError(f"section {name!r} has no roster")
+        sections.append({
+            'name': name,
+            'roster': os.path.join(base, entry['roster']),
+            'rounds': entry.get('rounds'),
+            'round_robin': bool(entry.get('round_robin')),
+            'accelerated': bool(entry.get('accelerated')),
+        })
+        if sections[-1]['round_robin'] and sections[-1]['accelerated']:
+            raise ValueError(f"section {name!r} can't be both a round robin and accelerated")
+    if not sections:
+        raise ValueError(f"{config_file} lists no sections")
+    return sections
+
+
+def section_results(name, matches, round_number, results_folder):
+    # A '<section>_round<N>.csv' (or .jsonl) file in the results folder is
+    # used as is; otherwise the arbiter is asked, as in main
+    if results_folder:
+        for extension in ('.csv', '.jsonl'):
+            path = os.path.join(results_folder, f"{name}_round{round_number}{extension}")
+            if not os.path.exists(path):
+                continue
+            results, errors = load_round_results(matches, path)
+            if results is not None:
+                print(f"Results for all {len(matches)} tables were read from {path}.")
+                return results
+            print(f"{len(errors)} problem(s) found, no results from {path} were applied:")
+            for error in errors:
+                print(f"  {error}")
+    return enter_results(matches, round_number)
+
+
+def write_dashboard(path, sections, standings):
+    # One overview sheet with every section's leader, plus the full
+    # standings of each section, for the hall screens
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    styles = ReportStyles(wb)
+
+    overview = SheetWriter(wb.create_sheet("Dashboard"))
+    overview.write_headers(1, ["Section", "Round", "Players", "Leader", "Score", "Opponent Scores"])
+    for row, section in enumerate(sections, start=2):
+        rows = standings[section['name']]
+        overview.write(row, 1, section['name'])
+        overview.write(row, 2, f"{section['completed_round']}/{section['num_rounds']}")
+        overview.write(row, 3, len(rows))
+        if section['completed_round'] and rows:
+            overview.write(row, 4, rows[0]['name'], styles.player(rows[0]))
+            overview.write(row, 5, rows[0]['score'])
+            overview.write(row, 6, f"{rows[0]['opponent_scores']:.2f}")
+    overview.fit_columns()
+
+    for section in sections:
+        sheet = SheetWriter(wb.create_sheet(section['name']))
+        sheet.write_headers(1, ["Rank", "Player", "Score", "Opponent Scores", "Wins", "Median Buchholz",
+                                "Sonneborn-Berger", "Progressive"])
+        for rank, player in enumerate(standings[section['name']], start=1):
+            sheet.write(rank+1, 1, rank)
+            sheet.write(rank+1, 2, player['name'], styles.player(player))
+            sheet.write(rank+1, 3, player['score'])
+            sheet.write(rank+1, 4, f"{player['opponent_scores']:.2f}")
+            sheet.write(rank+1, 5, player['wins'])
+            sheet.write(rank+1, 6, player['median_buchholz'])
+            sheet.write(rank+1, 7, f"{player['sonneborn_berger']:.2f}")
+            sheet.write(rank+1, 8, player['progressive'])
+        sheet.fit_columns()
+
+    try:
+        # Saved aside and swapped in, so a screen polling the file never
+        # opens a half-written one
+        wb.save(path + ".tmp")
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Could not update the dashboard {path}: {e}")
+
+
+def run_sections(sections, output_folder, results_folder=None, fresh=False):
+    # Every section gets a single-worker pool of its own, so a round is
+    # paired in all sections at once while each section's state stays put
+    # in its worker between rounds
+    pools = {section['name']: ProcessPoolExecutor(max_workers=1) for section in sections}
+    try:
+        opened = {section['name']: pools[section['name']].submit(
+                      open_section, section['name'], section['roster'], section['rounds'],
+                      os.path.join(output_folder, section['name']), section['round_robin'], fresh,
+                      section['accelerated'])
+                  for section in sections}
+        standings = {}
+        for section in sections:
+            info = opened[section['name']].result()
+            section.update(num_rounds=info['num_rounds'], completed_round=info['completed_round'],
+                           workbook=info['workbook'], ended=False)
+            standings[section['name']] = info['standings']
+            status = f"resuming after round {info['completed_round']}" if info['resumed'] else "new event"
+            print(f"{section['name']}: {info['players']} players, {info['num_rounds']} rounds, {status} "
+                  f"({info['workbook']})")
+
+        dashboard = os.path.join(output_folder, DASHBOARD_FILE)
+        while True:
+            active = [section for section in sections
+                      if not section['ended'] and section['completed_round'] < section['num_rounds']]
+            if not active:
+                break
+
+            paired = {section['name']: pools[section['name']].submit(pair_section, section['completed_round'] + 1)
+                      for section in active}
+            # Each section is scored and saved in its worker while the
+            # arbiter moves on to the next section's results
+            scored = {}
+            for section in active:
+                round_number = section['completed_round'] + 1
+                matches = paired[section['name']].result()
+                print(f"\n{section['name']} - Round {round_number}")
+                if matches is None:
+                    print(f"Unable to create matches. {section['name']} will end early.")
+                    section['ended'] = True
+                    continue
+                display_matches(matches)
+                results = section_results(section['name'], matches, round_number, results_folder)
+                results = [[p1['id'], s1, p2['id'] if p2 is not None else None, s2] for p1, s1, p2, s2 in results]
+                scored[section['name']] = pools[section['name']].submit(score_section, round_number, results)
+
+            for section in active:
+                if section['name'] in scored:
+                    standings[section['name']] = scored[section['name']].result()
+                    section['completed_round'] += 1
+            write_dashboard(dashboard, sections, standings)
+            print(f"\nDashboard updated: {dashboard}")
+
+        finished = {section['name']: pools[section['name']].submit(finish_section) for section in sections}
+        for section in sections:
+            print(f"{section['name']} summary has been added to {finished[section['name']].result()}")
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several tournament sections side by side, each with its "
+                                                 "own reports folder and a shared standings dashboard.")
+    parser.add_argument('config', help="JSON file listing the sections, their rosters and round counts")
+    parser.add_argument('--output', default=REPORT_FOLDER,
+                        help=f"folder for the section folders and {DASHBOARD_FILE} (default: {REPORT_FOLDER})")
+    parser.add_argument('--results', help="folder of <section>_round<N>.csv/.jsonl results files to use "
+                                          "instead of asking")
+    parser.add_argument('--fresh', action='store_true', help="start new events even if unfinished ones are found")
+    args = parser.parse_args()
+
+    try:
+        sections = load_sections(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    print(f"All reports will be saved to: {args.output}")
+    run_sections(sections, args.output, args.results, args.fresh)
+    print("Thank you for using the Chess Tournament Manager!")
+
+
+if __name__ == "__main__":
+    main()
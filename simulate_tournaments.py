@@ -0,0 +1,162 @@
+import json
+import math
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from CF_chess_management import (Player, PlayedMatches, create_matches, update_scores, match_result,
+                                 get_standings, recommend_rounds, suggest_rounds, acceleration_group, accelerate)
+from lookahead import lookahead_matches
+
+
+# Rating model for the synthetic fields
+RATING_MEAN = 1500
+RATING_SPREAD = 250
+WHITE_ADVANTAGE = 35  # Elo points
+DRAW_RATE = 0.3  # Draw probability between equal players, shrinking with the rating gap
+
+
+def round_policies(num_players):
+    # The round counts main can end up with for a field of this size
+    return {
+        'recommend_rounds': recommend_rounds(num_players),
+        'suggest_rounds': suggest_rounds(num_players)[0],
+        '40% cap': min(int(num_players * 0.4), 12),
+        'log2 + 2': math.ceil(math.log2(num_players)) + 2,
+    }
+
+
+def game_outcome(rng, white_rating, black_rating):
+    expected = 1 / (1 + 10 ** ((black_rating - white_rating - WHITE_ADVANTAGE) / 400))
+    draw = DRAW_RATE * 2 * min(expected, 1 - expected)
+    roll = rng.random()
+    if roll < expected - draw / 2:
+        return '1'
+    if roll < expected + draw / 2:
+        return 'd'
+    return '2'
+
+
+def simulate_tournament(task):
+    num_players, num_rounds, seed, lookahead, seeding = task
+    rng = random.Random(seed)
+    random.seed(seed)  # create_matches shuffles round 1 with the module-level generator
+
+    players = [Player(i, f"Player {i + 1}") for i in range(num_players)]
+    ratings = {player.id: rng.gauss(RATING_MEAN, RATING_SPREAD) for player in players}
+    if seeding != 'random':
+        # The pairing knows the true strengths, as if the ratings were exact
+        for player in players:
+            player.rating = ratings[player.id]
+    group = acceleration_group(players) if seeding == 'accelerated' else None
+    played_matches = PlayedMatches(num_players)
+
+    rounds_played = 0
+    repeats = 0
+    for round_number in range(1, num_rounds + 1):
+        accelerate(players, group, round_number, num_rounds)
+        if lookahead and round_number < num_rounds:
+            # Already inside a pool worker, so the candidates are checked here
+            matches = lookahead_matches(players, played_matches, round_number, num_rounds, workers=0)
+        else:
+            matches = create_matches(players, played_matches, round_number)
+        if not matches:
+            break
+
+        results = []
+        for white, black in matches:
+            if black is None:
+                results.append((white, 2, None, 0))
+                continue
+            if played_matches.have_met(white, black):
+                repeats += 1
+            results.append(match_result((white, black), game_outcome(rng, ratings[white.id], ratings[black.id])))
+        update_scores(results, players)
+
+        for white, black in matches:
+            if black is not None:
+                played_matches.add(white, black)
+        rounds_played = round_number
+
+    standings = get_standings(players)
+    strongest = max(players, key=lambda player: ratings[player.id])
+    imbalances = [abs(player.whites - player.blacks) for player in players]
+    return {
+        'winner_found': standings[0] is strongest,
+        'strongest_rank': standings.index(strongest) + 1,
+        'dead_end': rounds_played < num_rounds,
+        'repeats': repeats,
+        'mean_color_imbalance': sum(imbalances) / num_players,
+        'color_imbalance_2plus': sum(1 for imbalance in imbalances if imbalance >= 2) / num_players,
+    }
+
+
+def summarize(outcomes):
+    count = len(outcomes)
+    return {
+        'tournaments': count,
+        'winner_found_rate': sum(outcome['winner_found'] for outcome in outcomes) / count,
+        'mean_strongest_rank': sum(outcome['strongest_rank'] for outcome in outcomes) / count,
+        'dead_end_rate': sum(outcome['dead_end'] for outcome in outcomes) / count,
+        'repeat_rate': sum(outcome['repeats'] > 0 for outcome in outcomes) / count,
+        'mean_color_imbalance': sum(outcome['mean_color_imbalance'] for outcome in outcomes) / count,
+        'color_imbalance_2plus': sum(outcome['color_imbalance_2plus'] for outcome in outcomes) / count,
+    }
+
+
+def run_simulation(field_sizes, tournaments, seed, workers=None, extra_rounds=(), lookahead=False, seeding='random'):
+    # Every (field size, round count) pair gets the same list of seeds, so
+    # policies are compared on identical synthetic fields
+    report = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for num_players in field_sizes:
+            policies = round_policies(num_players)
+            for rounds in extra_rounds:
+                policies[f"{rounds} rounds"] = rounds
+
+            for policy, num_rounds in policies.items():
+                tasks = [(num_players, num_rounds, seed + i, lookahead, seeding) for i in range(tournaments)]
+                outcomes = list(pool.map(simulate_tournament, tasks, chunksize=max(1, tournaments // 64)))
+                report.append({'players': num_players, 'policy': policy, 'rounds': num_rounds,
+                               **summarize(outcomes)})
+    return report
+
+
+def print_report(report):
+    print(f"{'Players':>7} {'Policy':<18} {'Rounds':>6} {'Winner':>7} {'Rank':>6} {'DeadEnd':>8} "
+          f"{'Repeat':>7} {'ColorImb':>9} {'Imb>=2':>7}")
+    for row in report:
+        print(f"{row['players']:>7} {row['policy']:<18} {row['rounds']:>6} {row['winner_found_rate']:>7.1%} "
+              f"{row['mean_strongest_rank']:>6.2f} {row['dead_end_rate']:>8.1%} {row['repeat_rate']:>7.1%} "
+              f"{row['mean_color_imbalance']:>9.2f} {row['color_imbalance_2plus']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many Swiss tournaments to compare round-count policies.")
+    parser.add_argument('--players', type=int, nargs='+', default=[8, 16, 32, 60],
+                        help="field sizes to simulate")
+    parser.add_argument('--tournaments', type=int, default=2000, help="tournaments per field size and policy")
+    parser.add_argument('--rounds', type=int, nargs='*', default=[], help="extra fixed round counts to try")
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--workers', type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument('--json', help="also write the report to this file")
+    parser.add_argument('--lookahead', action='store_true',
+                        help="pair with the lookahead that checks the remaining rounds stay pairable")
+    parser.add_argument('--seeding', choices=('random', 'rating', 'accelerated'), default='random',
+                        help="round 1 drawn at random, seeded by rating, or seeded with accelerated pairings")
+    args = parser.parse_args()
+
+    if any(num_players < 4 for num_players in args.players):
+        parser.error("field sizes must be at least 4")
+
+    report = run_simulation(args.players, args.tournaments, args.seed, args.workers, args.rounds, args.lookahead,
+                            args.seeding)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()